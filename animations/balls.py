@@ -0,0 +1,102 @@
+"""
+Balls moving up and down the columns, drawn with the particle system.
+The bottom of a column is y = height - 1.
+"""
+
+import math
+
+import numpy as np
+
+from frame import FrameMatrix
+from particles import Particles
+
+
+class BouncyBalls(FrameMatrix):
+    def __init__(self, *args,
+                 balls=2,
+                 gravity=0.02,
+                 elasticity=0.85,
+                 fade=0.7,
+                 **kwds):
+
+        # Number of balls in each column
+        self.balls = balls
+
+        # Added to a ball's downward speed every step
+        self.gravity = gravity
+
+        # Fraction of its speed a ball keeps when it bounces
+        self.elasticity = elasticity
+
+        # The base class MUST be initialized by calling super like this
+        super().__init__(*args, fade=fade, **kwds)
+
+        # Fast enough to reach the top from the bottom
+        self.launch_speed = math.sqrt(2 * gravity * (self.height - 1))
+
+        n = balls * self.width
+        self.particles = Particles(n)
+        self.particles.spawn(
+            n, x=np.repeat(self.xs, balls),
+            y=np.random.uniform(0, self.height - 1, n),
+            color=self.palette_colors(np.random.randint(256, size=n)))
+
+    def render(self, amt=1):
+        p = self.particles
+        p.move(amt, self.gravity)
+
+        bottom = self.height - 1
+        y, vy = p.y, p.vy
+        landed = y > bottom
+        y[landed] = 2 * bottom - y[landed]
+        vy[landed] *= -self.elasticity
+
+        # Balls that have nearly stopped bouncing get thrown up again
+        tired = landed & (np.abs(vy) < self.launch_speed / 4)
+        vy[tired] = -self.launch_speed * np.random.uniform(0.5, 1, tired.sum())
+
+        p.draw(self.frame)
+
+        self._step += amt
+
+
+class Juggle(FrameMatrix):
+    def __init__(self, *args,
+                 balls=8,
+                 speed=0.005,
+                 hue_step=32,
+                 column_offset=0.05,
+                 fade=0.92,
+                 **kwds):
+
+        # Number of balls in each column
+        self.balls = balls
+
+        # Cycles per step of the slowest ball. Like FastLED's juggle, each
+        # ball is a little faster than the one before.
+        self.speed = speed
+
+        # Palette distance between the colors of neighbouring balls
+        self.hue_step = hue_step
+
+        # Fraction of a cycle each column is behind the one before it
+        self.column_offset = column_offset
+
+        # The base class MUST be initialized by calling super like this
+        super().__init__(*args, fade=fade, **kwds)
+
+        ball = np.tile(np.arange(balls), self.width)
+        x = np.repeat(self.xs, balls)
+        self.frequencies = speed * (ball + 7) / 7
+        self.offsets = column_offset * x
+
+        self.particles = Particles(len(ball))
+        self.particles.spawn(len(ball), x=x,
+                             color=self.palette_colors(ball * hue_step))
+
+    def render(self, amt=1):
+        cycles = self.frequencies * self._step + self.offsets
+        self.particles.y = (self.height - 1) * (1 - np.cos(2 * np.pi * cycles)) / 2
+        self.particles.draw(self.frame, blend=True)
+
+        self._step += amt
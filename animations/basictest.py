@@ -1,9 +1,9 @@
 import math
 from bibliopixel import animation
 from bibliopixel.colors import COLORS
-from bibliopixel.animation.matrix import Matrix
+from frame import FrameMatrix
 
-class BasicTest(Matrix):
+class BasicTest(FrameMatrix):
     def __init__(self, *args,
                  **kwds):
 
@@ -20,16 +20,13 @@ class BasicTest(Matrix):
 #                    self.layout.set(i, j, (0,0,0))
 #
 #        self._step += amt
-    def step(self, amt=1):
+    def render(self, amt=1):
         color = self.palette(self._step)
 
-        for i in range(self.layout.width):
-            for j in range(self.layout.height):
-                pos = j + self.layout.height * i + self._step
+        pos = self.ys[None, :] + self.layout.height * self.xs[:, None] + self._step
+        lit = pos % (self.layout.width * self.layout.height) == 0
 
-                if pos % (self.layout.width * self.layout.height) == 0:
-                    self.layout.set(i, j, color)
-                else:
-                    self.layout.set(i, j, (0,0,0))
+        self.frame[:] = (0,0,0)
+        self.frame[lit] = color
 
         self._step += amt
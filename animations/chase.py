@@ -1,9 +1,11 @@
 import math
+import numpy as np
 from bibliopixel import animation
 from bibliopixel.colors import COLORS
-from bibliopixel.animation.matrix import Matrix
+from frame import FrameMatrix
+import frame_cache, phase
 
-class Chase(Matrix):
+class Chase(FrameMatrix):
     def __init__(self, *args,
                  alternating=2,
                  spacing=40,
@@ -29,48 +31,52 @@ class Chase(Matrix):
         # Chase goes up or down (up, down)
         self.direction = direction
 
-        # Fades previously lit pixels by a percentage
-        self.fade = fade
+        super().__init__(*args, fade=fade, **kwds)
 
-        super().__init__(*args, **kwds)
+    # True for the columns which chase in reverse
+    def reversed_columns(self):
+        if self.alternating > 0:
+            return (self.xs // self.alternating) % 2 != 0
+        return np.ones(self.width, bool)
 
-    def step(self, amt=1):
-        colors = [self.palette(self._step), self.palette(self._step * -1)]
-        color = colors[0]
+    def pattern(self):
+        key = ('Chase', self.width, self.height, self.alternating,
+               self.direction, self.spacing, self.length)
+        return phase.phase_mask(key, self.make_pattern)
 
-        for i in range(self.layout.width):
+    def make_pattern(self):
+        alter_reverse = np.where(self.reversed_columns(), -1, 1)
+        pos = self.ys[None, :] * alter_reverse[:, None] * self.direction
+        return phase.PhaseMask(pos, self.spacing + self.length, [range(self.length)])
 
-            if self.alternating > 0 and (math.floor(i / self.alternating)) % 2 == 0:
-                alter_reverse = 1
-                color = colors[0]
-            else:
-                alter_reverse = -1
-                if self.alternating_colors:
-                    color = colors[1]
+    def render(self, amt=1):
+        colors = self.palette_colors([self._step, self._step * -1])
 
-            for j in range(self.layout.height):
-                pos = j * alter_reverse * self.direction + self._step
+        # Which of the two colors each column uses
+        if self.alternating_colors:
+            column_colors = colors[self.reversed_columns().astype(int)]
+        else:
+            column_colors = colors[np.zeros(self.width, int)]
 
-                if pos % (self.spacing + self.length) in range(self.length):
-                    self.layout.set(i, j, color)
-                else:
-                    if self.fade < 1:
-                        self.fade_pixel(i, j)
-                    else:
-                        self.layout.set(i, j, (0,0,0))
+        lit = self.pattern()(self._step)
+        self.paint(lit, column_colors[:, None])
 
         self._step += amt
 
-    # fades pixel at [i,j] by self.fade
-    def fade_pixel(self, i, j):
-        old = self.layout.get(i, j)
-        if old != (0,0,0):
-            self.layout.set(
-                i, j,
-                [math.floor(x * self.fade) for x in old]
-            )
+    def period(self):
+        return frame_cache.lcm(self.spacing + self.length, self.palette_period())
 
-class ChaseUp(Matrix):
+    def cache_params(self):
+        return (self.alternating, self.alternating_colors, self.spacing,
+                self.length, self.direction)
+
+    def program(self):
+        speeds = 1
+        if self.alternating_colors:
+            speeds = np.where(self.reversed_columns(), -1, 1)[:, None]
+        return self.firmware_program(0, speeds, self.pattern())
+
+class ChaseUp(FrameMatrix):
     def __init__(self, *args,
                  spacing=40,
                  length=2,
@@ -87,32 +93,35 @@ class ChaseUp(Matrix):
         # Chase goes up or down (up, down)
         self.direction = direction
 
-        # Fades previously lit pixels by a percentage
-        self.fade = fade
+        super().__init__(*args, fade=fade, **kwds)
+
+    def pattern(self):
+        key = ('ChaseUp', self.width, self.height, self.direction,
+               self.spacing, self.length)
+        return phase.phase_mask(key, self.make_pattern)
 
-        super().__init__(*args, **kwds)
+    def make_pattern(self):
+        pos = np.broadcast_to(self.ys * self.direction, (self.width, self.height))
+        return phase.PhaseMask(pos, self.spacing + self.length, [range(self.length)])
 
-    def step(self, amt=1):
-        for i in range(self.layout.width):
-            color = self.palette(self._step + 50 * math.floor(i/4))
-            for j in range(self.layout.height):
-                pos = j * self.direction - self._step
+    def pair_positions(self):
+        # A color for each pair of sides
+        return 50 * (self.geometry.face[:, 0] // 2)
 
-                if pos % (self.spacing + self.length) in range(self.length):
-                    self.layout.set(i, j, color)
-                else:
-                    if self.fade < 1:
-                        self.fade_pixel(i, j)
-                    else:
-                        self.layout.set(i, j, (0,0,0))
+    def render(self, amt=1):
+        lit = self.pattern()(-self._step)
+
+        colors = self.palette_colors(self._step + self.pair_positions())
+        self.paint(lit, colors[:, None])
 
         self._step += amt
 
-    # fades pixel at [i,j] by self.fade
-    def fade_pixel(self, i, j):
-        old = self.layout.get(i, j)
-        if old != (0,0,0):
-            self.layout.set(
-                i, j,
-                [math.floor(x * self.fade) for x in old]
-            )
+    def period(self):
+        return frame_cache.lcm(self.spacing + self.length, self.palette_period())
+
+    def cache_params(self):
+        return self.spacing, self.length, self.direction
+
+    def program(self):
+        positions = self.pair_positions()
+        return self.firmware_program(positions[:, None], 1, self.pattern(), -1)
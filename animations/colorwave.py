@@ -1,21 +1,24 @@
 import datetime
 from bibliopixel import animation
 from bibliopixel.colors import COLORS
-from bibliopixel.animation.matrix import Matrix
+from frame import FrameMatrix
+import frame_cache
 
-class Horizontal(Matrix):
+class Horizontal(FrameMatrix):
     def __init__(self, *args, **kwds):
         #The base class MUST be initialized by calling super like this
         super().__init__(*args, **kwds)
 
-    def step(self, amt=1):
-        for i in range(self.layout.width):
-            for j in range(self.layout.height):
-                self.layout.set(i,j,self.palette(1*i + self._step))
+    def render(self, amt=1):
+        colors = self.palette_colors(1*self.xs + self._step)
+        self.frame[:] = colors[:, None]
 
         self._step += amt
 
-class Vertical(Matrix):
+    def period(self):
+        return frame_cache.lcm(self.palette_period())
+
+class Vertical(FrameMatrix):
     def __init__(self, *args,
                  bloom=False,
                  color_speed=2,
@@ -34,15 +37,30 @@ class Vertical(Matrix):
 
         super().__init__(*args, **kwds)
 
-    def step(self, amt=1):
-        for j in range(self.layout.height):
-            if self.bloom:
-                distance = abs(self.layout.height / 2 - j)
-                color = self.palette(self._step * self.color_speed - distance * self.color_distance)
-            else:
-                color = self.palette(self.color_speed * j + self._step * self.color_distance)
+    def render(self, amt=1):
+        if self.bloom:
+            distance = abs(self.layout.height / 2 - self.ys)
+            colors = self.palette_colors(self._step * self.color_speed - distance * self.color_distance)
+        else:
+            colors = self.palette_colors(self.color_speed * self.ys + self._step * self.color_distance)
 
-            for i in range(self.layout.width):
-                self.layout.set(i,j,color)
+        self.frame[:] = colors[None, :]
 
         self._step += amt
+
+    def period(self):
+        # The palette position moves this much each step
+        speed = self.color_speed if self.bloom else self.color_distance
+        if speed == round(speed):
+            return frame_cache.lcm(self.palette_period())
+
+    def cache_params(self):
+        return self.bloom, self.color_speed, self.color_distance
+
+    def program(self):
+        if self.bloom:
+            distance = abs(self.layout.height / 2 - self.ys)
+            return self.firmware_program(
+                -distance * self.color_distance, self.color_speed)
+        return self.firmware_program(
+            self.color_speed * self.ys, self.color_distance)
@@ -0,0 +1,120 @@
+"""
+Runs several animations at once, each into its own frame, and blends them
+together as layers, the first animation at the bottom.
+
+Layers that can't be seen aren't rendered at all: anything under an opaque
+``alpha`` layer, and any layer with an alpha of 0. So two layers cost about
+what the two animations cost on their own.
+
+    - typename: compositor.Compositor
+      name: SparklyWaves
+      animations:
+        - colorwave.Vertical
+        - sparkles.Sparkles
+      layers:
+        - {}
+        - {mode: add, alpha: 0.8}
+"""
+
+from bibliopixel.animation.collection import Collection
+
+from frame import FrameMatrix
+from wonderdomicile import blend
+
+
+class Layer:
+    """
+    How one animation is blended onto the layers under it, see
+    :py:func:`wonderdomicile.blend.blend`.
+    """
+
+    def __init__(self, mode='alpha', alpha=1, key=False):
+        if mode not in blend.MODES:
+            raise ValueError('Unknown blend mode %s' % mode)
+        self.mode = mode
+        self.alpha = alpha
+        self.key = key
+
+    @property
+    def opaque(self):
+        """
+        True if the layers under this one can't be seen through it.
+        """
+        return self.mode == 'alpha' and self.alpha >= 1 and not self.key
+
+    @property
+    def visible(self):
+        return self.alpha > 0
+
+
+class Compositor(FrameMatrix, Collection):
+    def __init__(self, *args, layers=(), **kwds):
+        # The base class MUST be initialized by calling super like this
+        super().__init__(*args, **kwds)
+
+        # One dict of Layer parameters for each animation, in the same
+        # order. Missing ones are opaque.
+        layers = list(layers)
+        if len(layers) > len(self.animations):
+            raise ValueError('More layers than animations')
+        layers += [{}] * (len(self.animations) - len(layers))
+        self.layers = [Layer(**layer) for layer in layers]
+
+        # Animations that don't draw into a frame of their own get their own
+        # layout to draw on instead
+        for a in self.animations:
+            if not isinstance(a, FrameMatrix):
+                a.layout = a.layout.clone()
+
+    def pre_run(self):
+        super().pre_run()
+        for a in self.animations:
+            a._pre_run()
+
+    def prewarm(self):
+        # The layers are advanced here rather than stepped, so don't need
+        # render workers
+        for a in self.animations:
+            if isinstance(a, FrameMatrix) and not a.worker:
+                a.prewarm()
+
+    def visible_layers(self):
+        """
+        :return: the indices of the layers that can be seen, bottom first
+        """
+        bottom = 0
+        for i, layer in enumerate(self.layers):
+            if layer.opaque:
+                bottom = i
+        return [i for i in range(bottom, len(self.layers))
+                if self.layers[i].visible]
+
+    def render(self, amt=1):
+        visible = self.visible_layers()
+        if not visible or not self.layers[visible[0]].opaque:
+            self.frame[:] = 0
+
+        for i in visible:
+            layer = self.layers[i]
+            frame = self.render_layer(self.animations[i], amt)
+            if layer.opaque:
+                self.frame[:] = frame
+            else:
+                blend.blend(self.frame, frame, layer.mode, layer.alpha,
+                            layer.key, out=self.frame)
+
+        self._step += amt
+
+    def render_layer(self, animation, amt=1):
+        """
+        Advance one animation by a frame.
+
+        :return: its frame
+        """
+        if isinstance(animation, FrameMatrix):
+            animation.advance(amt)
+            return animation.frame
+
+        animation.step(amt)
+        colors = blend.to_array(animation.color_list)
+        return colors[self.pixel_index]
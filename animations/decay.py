@@ -0,0 +1,71 @@
+"""
+Whole-frame fading, shared by every animation that leaves trails.
+"""
+
+import numpy as np
+
+
+class Decay:
+    def __init__(self, fade=1, cooling=0):
+        """
+        :param fade: fraction of each channel kept per frame, 0 - 1
+        :param cooling: amount subtracted from each channel per frame,
+            after fading
+        """
+        self.fade = fade
+        self.cooling = cooling
+
+        # What every byte value decays to, so a uint8 frame decays with
+        # one table lookup per channel and no float math
+        self.table = make_table(fade, cooling)
+
+        # Tables for decaying several frames at once, by number of frames
+        self._tables = {1: self.table}
+
+    def __call__(self, buf, cooling=None, frames=1):
+        """
+        Decay buf in place.
+
+        :param buf: uint8 frame, or float buffer such as a heat map
+        :param cooling: optional extra amount to subtract, either a scalar or
+            an array broadcastable to buf. Results never go below zero.
+        :param frames: how many frames' worth to decay by at once, for
+            animations stepping by more than one
+        """
+        if buf.dtype == np.uint8:
+            np.take(self.table_for(frames), buf, out=buf)
+        else:
+            if self.fade != 1:
+                buf *= self.fade ** frames
+            if self.cooling:
+                buf -= self.cooling * frames
+                np.maximum(buf, 0, out=buf)
+
+        if cooling is not None:
+            if buf.dtype == np.uint8:
+                # subtract without wrapping around below zero
+                buf -= np.minimum(buf, cooling).astype(np.uint8)
+            else:
+                buf -= cooling
+                np.maximum(buf, 0, out=buf)
+
+    def table_for(self, frames=1):
+        """
+        :return: the table that decays a uint8 frame by `frames` frames
+        """
+        frames = max(1, int(round(frames)))
+        table = self._tables.get(frames)
+        if table is None:
+            table = self.table
+            for i in range(frames - 1):
+                table = self.table[table]
+            self._tables[frames] = table
+        return table
+
+
+def make_table(fade, cooling=0):
+    """
+    :return: uint8 array where table[v] is what byte value v decays to
+    """
+    values = np.floor(np.arange(256) * fade) - cooling
+    return np.clip(values, 0, 255).astype(np.uint8)
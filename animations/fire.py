@@ -1,9 +1,13 @@
-import math
 import random
 
-from bibliopixel.animation.matrix import Matrix
 import numpy as np
 
+from decay import Decay
+from frame import FrameMatrix
+from particles import Particles
+from wonderdomicile import audio
+import palette_table
+
 
 # based on shift5 from https://stackoverflow.com/a/42642326/133518
 from bibliopixel.colors import COLORS, palette
@@ -33,20 +37,18 @@ class FlameSimulator:
         self.height = height
 
         self.heat_buf = np.zeros((self.width, self.height,))
+        self.decay = Decay()
 
-    def step(self, heat_mask=None):
+    def step(self, heat_mask=None, intensity=1):
         """
         :param heat_mask: shape (width,) - 0-1 multiplier for the probability of sparking that column.
+        :param intensity: multiplier for the probability of sparking everywhere, like from wonderdomicile.audio
         :return:
         """
 
-        # intensity = math.pow(1 - self.ctx.beat_tracker.beat_raw, self.param('beat_alpha'))
-        intensity = 1
-
         # Step 1.  Cool down every cell a little
-        self.heat_buf = self.heat_buf - np.random.random_sample(self.heat_buf.shape) * (
-                self.cooling / self.height)
-        np.clip(self.heat_buf, 0, 1, self.heat_buf)
+        self.decay(self.heat_buf, np.random.random_sample(self.heat_buf.shape) * (
+                self.cooling / self.height))
 
         # Step 2.  Heat from each cell drifts 'up' and diffuses a little
         # self.heat_buf = 0.33 * shift_and_copy_2d(self.heat_buf, -1) + \
@@ -71,14 +73,127 @@ class FlameSimulator:
         np.clip(self.heat_buf, 0, 1, self.heat_buf)
 
 
-class Fire(Matrix):
+class InPlaceFlameSimulator(FlameSimulator):
+    """
+    Same simulation as FlameSimulator, but every step works in preallocated
+    buffers and draws its random numbers from a pool that is only refilled
+    every `refill` steps, so nothing is allocated per frame.
+    """
+
+    # Distance heat drifts up per step, see step 2
+    DRIFT = 4
+
+    def __init__(self, width, height, pool_frames=4, refill=30):
+        super().__init__(width, height)
+
+        # Two heat buffers padded with DRIFT extra rows at the top end, so
+        # drifting is adding shifted views of one into the other
+        self.heat_bufs = [np.zeros((width, height + self.DRIFT)) for i in range(2)]
+        self.heat_buf = self.heat_bufs[0][:, :height]
+
+        # Random numbers for cooling every cell and for sparking each column
+        self.rng = np.random.default_rng()
+        self.per_step = width * height + 2 * width
+        self.random_pool = np.empty(pool_frames * self.per_step)
+        self.refill = refill
+        self.steps_since_refill = refill
+
+        # Scratch buffers
+        self.cooling_buf = np.empty((width, height))
+        self.spark_heat = np.empty(width)
+        self.ignite = np.empty(width, bool)
+        self.spark_scaled = np.empty(width)
+
+        self.heat_mask = None
+        self.spark_probs = np.full(width, self.sparking)
+
+    def random_numbers(self):
+        """
+        :return: a window of per_step uniform random numbers from the pool
+        """
+        if self.steps_since_refill >= self.refill:
+            self.rng.random(out=self.random_pool)
+            self.steps_since_refill = 0
+        self.steps_since_refill += 1
+
+        start = self.rng.integers(len(self.random_pool) - self.per_step + 1)
+        return self.random_pool[start:start + self.per_step]
+
+    def set_heat_mask(self, heat_mask):
+        if heat_mask is None:
+            self.spark_probs[:] = self.sparking
+        else:
+            assert heat_mask.shape == (self.width,)
+            np.multiply(heat_mask, self.sparking, out=self.spark_probs)
+        self.heat_mask = heat_mask
+
+    def step(self, heat_mask=None, intensity=1):
+        """
+        :param heat_mask: shape (width,) - 0-1 multiplier for the probability of sparking that column.
+            The spark probabilities are only recomputed when a different mask is passed.
+        :param intensity: multiplier for the probability of sparking everywhere
+        """
+        if heat_mask is not self.heat_mask:
+            self.set_heat_mask(heat_mask)
+
+        width, height = self.width, self.height
+        randoms = self.random_numbers()
+        cooling = randoms[:width * height].reshape(width, height)
+        spark_heat = randoms[width * height:-width]
+        spark_chance = randoms[-width:]
+
+        # Step 1.  Cool down every cell a little
+        np.multiply(cooling, self.cooling / height, out=self.cooling_buf)
+        self.decay(self.heat_buf, self.cooling_buf)
+
+        # Step 2.  Heat from each cell drifts 'up' and diffuses a little
+        src, dst = self.heat_bufs
+        src[:, height:] = src[:, height - 1:height]
+        heat_buf = dst[:, :height]
+        np.add(src[:, 1:height + 1], src[:, 2:height + 2], out=heat_buf)
+        for i in range(3, self.DRIFT + 1):
+            heat_buf += src[:, i:height + i]
+        heat_buf *= 1 / self.DRIFT
+
+        self.heat_bufs.reverse()
+        self.heat_buf = heat_buf
+
+        # Step 3.  Randomly ignite new 'sparks' of heat
+        np.multiply(spark_heat, 1 - 160/255, out=self.spark_heat)
+        self.spark_heat += 160/255
+        spark_probs = self.spark_probs
+        if intensity != 1:
+            spark_probs = np.multiply(spark_probs, intensity, out=self.spark_scaled)
+        np.less(spark_chance, spark_probs, out=self.ignite)
+        self.spark_heat *= self.ignite
+
+        bottom = heat_buf[:, height - 1]
+        bottom += self.spark_heat
+        np.minimum(bottom, 1, out=bottom)
+
+
+class Fire(FrameMatrix):
     def __init__(self, *args,
+                 in_place=False,
+                 spouts=None,
+                 audio=0,
                  **kwds):
         # The base class MUST be initialized by calling super like this
         super().__init__(*args, **kwds)
 
+        # How much more it sparks on a beat, 0 to ignore the sound
+        self.audio = audio
+
+        # Fire spouts: per column 0-1 multiplier for the chance of sparking.
+        # None lets every column spark equally.
+        self.spouts = spouts
+        self.heat_mask = None if spouts is None else np.array(spouts, float)
+
         width, height = self.layout.dimensions
-        self.flames = FlameSimulator(width, height)
+        if in_place:
+            self.flames = InPlaceFlameSimulator(width, height)
+        else:
+            self.flames = FlameSimulator(width, height)
 
         self.palette = self.make_heat_palette(COLORS.red, COLORS.yellow)
 
@@ -87,24 +202,70 @@ class Fire(Matrix):
         p1 = palette.Palette([COLORS.black, cool_color], continuous=True, length=128, autoscale=True)
         p2 = palette.Palette([cool_color, hot_color], continuous=True, length=96, autoscale=True)
         p3 = palette.Palette([hot_color, COLORS.white], continuous=True, length=32, autoscale=True)
-        colors = []
-        for i in range(128):
-            colors.append(tuple([math.floor(x) for x in p1(i)]))
-        for i in range(96):
-            colors.append(tuple([math.floor(x) for x in p2(i)]))
-        for i in range(32):
-            colors.append(tuple([math.floor(x) for x in p3(i)]))
-
-        return palette.Palette(colors)
-
-    def step(self, amt=1):
-        self.flames.step()
-
-        for i in range(self.layout.width):
-            for j in range(self.layout.height):
-                c = int(self.flames.heat_buf[i,j] * 255)
-                c = self.palette(c)
-                # c = (c,c,c)
-                self.layout.set(i, j, c)
+        colors = np.concatenate([
+            palette_table.table_for(p1)(np.arange(128)),
+            palette_table.table_for(p2)(np.arange(96)),
+            palette_table.table_for(p3)(np.arange(32)),
+        ])
+
+        return palette.Palette(map(tuple, colors.tolist()))
+
+    def render(self, amt=1):
+        self.flames.step(self.heat_mask, audio.intensity(self.audio))
+        self.add_heat(self.flames.heat_buf, amt)
+
+        c = (self.flames.heat_buf * 255).astype(np.uint8)
+        self.frame[:] = self.palette_colors(c)
 
         self._step += amt
+
+    def add_heat(self, heat_buf, amt=1):
+        """
+        Subclasses can heat up the flames before they are drawn.
+        """
+
+
+class FireSpouts(Fire):
+    def __init__(self, *args,
+                 columns=None,
+                 rate=0.05,
+                 speed=(1.5, 3),
+                 gravity=0.03,
+                 heat=1,
+                 **kwds):
+
+        # Columns with a spout at the bottom, None for all of them
+        self.columns = columns
+
+        # Chance each step that a spout shoots out a blob
+        self.rate = rate
+
+        # Range of the speeds blobs are shot up at, in pixels per step
+        self.speed = speed
+
+        # Slows blobs down on the way up and brings them back down
+        self.gravity = gravity
+
+        # Heat a blob leaves in the flames where it is
+        self.heat = heat
+
+        super().__init__(*args, **kwds)
+
+        self.spout_columns = np.arange(self.width) if columns is None else np.asarray(columns)
+        self.particles = Particles()
+
+    def add_heat(self, heat_buf, amt=1):
+        p = self.particles
+        bottom = self.height - 1
+
+        shoot = self.spout_columns[
+            np.random.random_sample(len(self.spout_columns)) < self.rate * amt]
+        p.spawn(len(shoot), x=shoot, y=bottom,
+                vy=-np.random.uniform(*self.speed, len(shoot)))
+
+        p.move(amt, self.gravity)
+        p.kill((p.y > bottom) | (p.y < 0))
+
+        x, y, inside = p.pixels(self.width, self.height)
+        np.maximum.at(heat_buf, (x, y), self.heat)
+
@@ -0,0 +1,417 @@
+"""
+Base class for animations that draw into a numpy frame buffer instead of
+calling layout.set() once per pixel.
+"""
+
+import copy
+
+import numpy as np
+
+from bibliopixel.animation.matrix import Matrix
+from bibliopixel.util import log
+
+from wonderdomicile import geometry, procedural
+
+from decay import Decay
+from worker import HOST_ONLY, RenderWorker
+import frame_cache, palette_table
+
+
+class FrameMatrix(Matrix):
+    # Attributes advance() only reads, which throwaway_step() doesn't copy
+    SHARED = {
+        'palette', 'geometry', 'pixel_index', 'frame_index', 'xs', 'ys',
+        '_palette_table', '_table_palette',
+    }
+
+    def __init__(self, *args, fade=None, worker=False, cache=False,
+                 firmware=False, **kwds):
+        # The base class MUST be initialized by calling super like this
+        super().__init__(*args, **kwds)
+
+        # Render in a separate process while this animation is running,
+        # see worker.py
+        self.worker = worker
+        self._worker = None
+
+        # Play the frames back from a file if the animation is periodic,
+        # see frame_cache.py
+        self.cache = cache
+        self._frame_cache = None
+
+        # Have the Teensys render the animation themselves if it has a
+        # program() and they all can, see wonderdomicile/procedural.py.
+        # Wrappers which need the frames on the host, like crossfades, turn
+        # firmware_ok off while they do.
+        self.firmware = firmware
+        self.firmware_ok = True
+        self._program = None
+        self._on_firmware = False
+
+        # Fades previously lit pixels by a percentage before each frame.
+        # 1 or more clears the frame instead, None leaves it untouched.
+        self.fade = fade
+        self.decay = None
+        if fade is not None:
+            self.decay = Decay(fade if fade < 1 else 0)
+
+        # Frame buffer, indexed [x, y] like layout.set(x, y, color).
+        # It is kept between frames so animations can fade what they drew.
+        self.frame = np.zeros((self.width, self.height, 3), np.uint8)
+
+        # Index into layout.color_list for every [x, y] of the frame
+        self.pixel_index = getattr(self.layout, 'pixel_index', None)
+        if self.pixel_index is None:
+            self.pixel_index = make_pixel_index(self.layout, self.width, self.height)
+
+        # Layouts that generate their mapping also provide the inverse, which
+        # turns pushing the frame into a single gather
+        self.frame_index = getattr(self.layout, 'frame_index', None)
+
+        self._palette_table = None
+        self._table_palette = None
+
+        # Set by prewarm() until the animation starts, so that what it got
+        # ready is kept
+        self._warm = False
+
+        # Row and column numbers, handy for broadcasting against the frame
+        self.xs = np.arange(self.width)
+        self.ys = np.arange(self.height)
+
+        # Column, side, angle, height and so on of every [x, y], see
+        # wonderdomicile/geometry.py
+        self.geometry = geometry.for_layout(self.layout)
+
+    def pre_run(self):
+        # Mirror the layout being cleared at the start of the animation
+        if self.preclear:
+            self.frame[:] = 0
+        if not self._warm:
+            self._frame_cache = None
+        self._warm = False
+        self._program = None
+        self._on_firmware = False
+
+    def prewarm(self):
+        """
+        Get ready to run, on a background thread before the animation starts,
+        see wonderdomicile/prewarm.py: make the palette table, load the frame
+        cache, and start the render worker or render a throwaway step to
+        make anything else the first frame would.
+        """
+        self.palette_colors(0)
+        self._frame_cache = None
+        cache = self.get_frame_cache()
+        if self.worker:
+            # Sent the frame it would start from
+            if self.preclear:
+                self.frame[:] = 0
+            self.stop_worker()
+            self._worker = RenderWorker(self)
+            self._worker.start()
+        elif not (cache and cache.frames is not None):
+            self.throwaway_step()
+        self._warm = True
+
+    def throwaway_step(self):
+        """
+        Render a step, then put back everything it moved on: the frame,
+        _step and whatever else the animation keeps from step to step. What
+        it made that wasn't there before, like masks and scratch buffers, is
+        kept. The random numbers are shared with the animation running now,
+        so they are left alone.
+        """
+        before = set(vars(self))
+        state = {k: copy.deepcopy(v) for k, v in vars(self).items()
+                 if k not in HOST_ONLY and k not in self.SHARED}
+        try:
+            self.advance(1)
+        finally:
+            # Class attributes it set on the instance, like _step
+            for k in set(vars(self)) - before:
+                if hasattr(type(self), k):
+                    delattr(self, k)
+            self.__dict__.update(state)
+
+    def continue_from(self, animation, frame=True):
+        """
+        Carry on from the step and frame of the animation this one is
+        replacing, see wonderdomicile/control.py.
+
+        :param frame: copy the frame too, which mustn't be done while the
+            other animation is drawing it
+        """
+        self._step = animation._step
+        old = getattr(animation, 'frame', None) if frame else None
+        if old is not None and old.shape == self.frame.shape:
+            self.frame[:] = old
+
+    def step(self, amt=1):
+        # Whole steps can be shown from the firmware or the cache, even when
+        # an adaptive sequence skips some, see wonderdomicile/scheduler.py
+        whole = float(amt).is_integer() and amt >= 1
+        if self.firmware and whole and self.send_to_firmware(int(amt)):
+            self._step += amt
+            return
+        self._on_firmware = False
+
+        cache = whole and self.get_frame_cache()
+        if cache and cache.frames is not None:
+            self.frame[:] = cache.frames[self._step % cache.period]
+            self._step += amt
+
+        else:
+            step = self._step
+            if self.worker:
+                self.next_worker_frame(amt)
+            else:
+                self.advance(amt)
+            if cache:
+                cache.record(step, self.frame, amt)
+
+        self.push_frame()
+
+    def cleanup(self, clean_layout=True):
+        self.stop_worker()
+        super().cleanup(clean_layout)
+
+    def next_worker_frame(self, amt=1):
+        """
+        Copy the worker's next frame into self.frame, starting the worker
+        on the first frame. Until the worker has a frame ready, the last one
+        is shown again. Falls back to rendering here if it can't be sent to
+        the worker, or the worker has died.
+        """
+        if self._worker is None:
+            try:
+                self._worker = RenderWorker(self)
+            except Exception:
+                log.exception('%s: unable to start a render worker, '
+                              'rendering in process', self.title)
+                self.worker = False
+                self.advance(amt)
+                return
+            self._worker.start(wait=False)
+            self._worker.next_frame(self.frame, amt)
+
+        elif self._worker.alive:
+            self._worker.next_frame(self.frame, amt)
+
+        else:
+            log.error('%s: render worker died, rendering in process',
+                      self.title)
+            self.worker = False
+            self._worker = None
+            self.advance(amt)
+
+    def stop_worker(self):
+        if self._worker:
+            self._worker.stop()
+            log.debug('%s: %d late frames from the render worker',
+                      self.title, self._worker.late)
+            self._worker = None
+
+    def send_to_firmware(self, amt=1):
+        """
+        Have the drivers render this step on their devices, if they all can.
+        The first step sends them the program and the frame to start from.
+        They fade the frame `amt` times, like advance(amt).
+
+        :return: True if they will
+        """
+        drivers = self.layout.drivers
+        if not (self.firmware_ok and drivers and
+                all(getattr(d, 'procedural', False) for d in drivers)):
+            return False
+
+        if self._program is None:
+            self._program = self.program() or False
+            if not self._program:
+                log.info('%s: can\'t be rendered by the firmware', self.title)
+        if not self._program:
+            return False
+
+        colors = None
+        if not self._on_firmware:
+            colors = self.frame.reshape(-1, 3)[self.frame_order()]
+        step = self.firmware_step(amt)
+        for d in drivers:
+            d.tick(self._program, step, colors, amt)
+        self._on_firmware = True
+        return True
+
+    def firmware_step(self, amt=1):
+        """
+        :return: the step whose pixels advance(amt) paints, for the program
+            to paint them too
+        """
+        return self._step
+
+    def program(self):
+        """
+        Animations the firmware can render return a procedural.Program that
+        draws the same frames as advance(1), usually with
+        firmware_program(), or None.
+        """
+        return None
+
+    def firmware_program(self, positions, speeds, mask=None, mask_speed=1,
+                         table=None):
+        """
+        :param positions: palette positions of the pixels at step 0, an
+            array that broadcasts against the frame's [x, y]
+        :param speeds: how far the pixels' palette positions move each step
+        :param mask: PhaseMask of the lit pixels, None for all of them
+        :param mask_speed: how far the mask's offset moves each step
+        :param table: uint8 colors to use instead of the palette, one per
+            position
+        :return: the procedural.Program, or None if the palette positions
+            don't move by whole palette table entries
+        """
+        if table is None:
+            self.palette_colors(0)
+            table, scale = self._palette_table.table, self._palette_table.scale
+        else:
+            scale = 1
+
+        shape = self.frame.shape[:2]
+        order = self.frame_order()
+        speeds = np.broadcast_to(np.multiply(speeds, scale), shape)
+        if not np.array_equal(speeds, np.round(speeds)):
+            return None
+        base = np.floor(np.multiply(positions, scale))
+        base = np.broadcast_to(base, shape).astype(np.int64)
+
+        kwds = {}
+        if mask is not None:
+            group, phase = np.divmod(mask.base, 2 * mask.period)
+            kwds = dict(
+                mask=mask.table.reshape(-1, 2 * mask.period)[:, :mask.period],
+                phase=phase.ravel()[order], group=group.ravel()[order],
+                mask_speed=mask_speed)
+            if (mask.period > procedural.MAX_PERIOD or
+                    len(kwds['mask']) > procedural.MAX_GROUPS):
+                return None
+
+        if len(table) > procedural.MAX_TABLE:
+            return None
+        return procedural.Program(
+            table, base.ravel()[order], speeds.ravel()[order].astype(np.int64),
+            decay=self.decay and self.decay.table, **kwds)
+
+    def frame_order(self):
+        """
+        :return: the index into the flattened frame of every pixel of
+            layout.color_list
+        """
+        if self.frame_index is None:
+            index = np.zeros(self.layout.numLEDs, np.intp)
+            index[self.pixel_index.ravel()] = np.arange(self.pixel_index.size)
+            return index
+        return self.frame_index
+
+    def advance(self, amt=1):
+        """
+        Fade the previous frame and render the next one into self.frame.
+        """
+        if self.decay:
+            self.decay(self.frame, frames=amt)
+        self.render(amt)
+
+    def render(self, amt=1):
+        """
+        Draw the next frame into self.frame and advance self._step.
+        Subclasses implement this instead of step().
+        """
+        raise NotImplementedError
+
+    def period(self):
+        """
+        Animations whose frames only depend on _step and cache_params()
+        return how many steps it takes them to repeat, or None.
+        """
+        return None
+
+    def cache_params(self):
+        """
+        :return: the parameters, other than the palette and fade, that the
+            frames depend on
+        """
+        return ()
+
+    def palette_period(self):
+        return palette_table.palette_period(self.palette)
+
+    def get_frame_cache(self):
+        """
+        :return: the FrameCache for the animation as it is now, or None
+        """
+        if self._frame_cache is None:
+            self._frame_cache = False
+            period = self.cache and not self.worker and self.period()
+            if period:
+                key = frame_cache.cache_key(self, period)
+                self._frame_cache = frame_cache.FrameCache(
+                    key, period, self.frame.shape)
+
+        if self._frame_cache and not self._frame_cache.failed:
+            return self._frame_cache
+
+    def paint(self, mask, colors):
+        """
+        Set the pixels selected by a (width, height) bool mask.
+
+        :param colors: one color, or any array that broadcasts against
+            the frame, like one color per column of shape (width, 1, 3)
+        """
+        np.copyto(self.frame, colors, where=mask[..., None], casting='unsafe')
+
+    def palette_colors(self, positions):
+        """
+        Look up a whole array of palette positions at once.
+
+        :return: uint8 array of shape positions.shape + (3,)
+        """
+        if self._table_palette is not self.palette:
+            self._table_palette = self.palette
+            self._palette_table = palette_table.table_for(self.palette)
+        return self._palette_table(positions)
+
+    def push_frame(self):
+        """
+        Copy the whole frame buffer to the layout in one go.
+        """
+        if self.frame_index is None:
+            push(self.layout, self.pixel_index, self.frame)
+        else:
+            gather(self.layout, self.frame_index, self.frame)
+
+
+def make_pixel_index(layout, width, height):
+    """
+    :return: shape (width, height) array of positions in layout.color_list
+    """
+    index = np.empty((width, height), np.intp)
+    for y in range(height):
+        index[:, y] = layout.coord_map[y][:width]
+    return index
+
+
+def push(layout, pixel_index, frame):
+    colors = layout.color_list
+    if isinstance(colors, np.ndarray):
+        colors[pixel_index] = frame
+    else:
+        flat = np.zeros((len(colors), 3), np.uint8)
+        flat[pixel_index] = frame
+        colors[:] = map(tuple, flat.tolist())
+
+
+def gather(layout, frame_index, frame):
+    colors = layout.color_list
+    flat = frame.reshape(-1, 3)[frame_index]
+    if isinstance(colors, np.ndarray):
+        colors[:] = flat
+    else:
+        colors[:] = map(tuple, flat.tolist())
@@ -0,0 +1,159 @@
+"""
+Play periodic animations back from a file instead of rendering them.
+
+An animation whose frames only depend on its parameters and _step, and which
+repeats every `period` steps, records one cycle of frames into a .npy file the
+first time it runs. After that the file is memory mapped and each frame is a
+copy out of it. Files are named by a hash of the animation's class and
+parameters, and the least recently used ones are deleted to keep the cache
+under MAX_BYTES.
+
+Played back frames start from where the animation has settled into its
+cycle, so fading trails are there from the first frame rather than building
+up over the first cycle.
+"""
+
+import glob, hashlib, math, os, time
+
+import numpy as np
+
+from bibliopixel.util import log
+
+import palette_table
+
+CACHE_DIR = os.path.expanduser('~/.cache/wonderdomicile/frames')
+MAX_BYTES = 256 * 1024 * 1024
+
+# Recordings left unfinished are deleted after this many seconds
+STALE_SECONDS = 3600
+
+
+def lcm(*periods):
+    """
+    :return: the least common multiple of the periods, or None if any of them
+        is None or not a whole number
+    """
+    result = 1
+    for period in periods:
+        if period is None or period != round(period):
+            return None
+        period = int(round(period))
+        result = result * period // math.gcd(result, period)
+    return result
+
+
+def cache_key(animation, period):
+    desc = (
+        type(animation).__module__, type(animation).__qualname__,
+        animation.width, animation.height, animation.fade, period,
+        palette_table.palette_key(animation.palette),
+        animation.cache_params())
+    return hashlib.sha1(repr(desc).encode()).hexdigest()
+
+
+class FrameCache:
+    def __init__(self, key, period, shape):
+        """
+        :param key: name of the cache file
+        :param period: number of frames in a cycle
+        :param shape: shape of one frame
+        """
+        self.path = os.path.join(CACHE_DIR, key + '.npy')
+        self.period = period
+        self.shape = (period,) + tuple(shape)
+
+        # The whole cycle, memory mapped, or None until it is recorded
+        self.frames = load(self.path, self.shape)
+
+        # Frames left before recording starts. Until a whole cycle has
+        # passed, pixels could still hold what was drawn before it started.
+        self._warmup = period
+        self._recording = None
+        self._recorded = 0
+        self.failed = False
+
+    def record(self, step, frame, amt=1):
+        """
+        Called with each frame rendered, and the _step it was rendered at,
+        while the cycle is being recorded. A frame that skips steps starts
+        the recording over.
+        """
+        if amt != 1:
+            self._warmup = self.period
+            self._recorded = 0
+            return
+
+        if self._warmup:
+            self._warmup -= 1
+            return
+
+        index = step % self.period
+        if self._recording is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            self._temp = '%s.%d.tmp' % (self.path, os.getpid())
+            self._recording = np.lib.format.open_memmap(
+                self._temp, 'w+', np.uint8, self.shape)
+
+        if self._recorded < self.period:
+            self._recording[index] = frame
+            self._recorded += 1
+            return
+
+        # One frame past the cycle, check that it really does repeat
+        repeats = (self._recording[index] == frame).all()
+        self._recording.flush()
+        self._recording = None
+        if repeats:
+            os.replace(self._temp, self.path)
+            evict(keep=self.path)
+            self.frames = load(self.path, self.shape)
+        else:
+            log.warning('Frames do not repeat every %d steps, not caching',
+                        self.period)
+            os.remove(self._temp)
+            self.failed = True
+
+
+def load(path, shape):
+    try:
+        frames = np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+
+    if frames.shape != shape or frames.dtype != np.uint8:
+        return None
+
+    # Mark it as recently used
+    os.utime(path)
+    return frames
+
+
+def evict(keep=None, max_bytes=MAX_BYTES):
+    """
+    Delete the least recently used files until the cache fits in max_bytes.
+    """
+    for path in glob.glob(os.path.join(CACHE_DIR, '*.tmp')):
+        try:
+            if os.stat(path).st_mtime < time.time() - STALE_SECONDS:
+                os.remove(path)
+        except OSError:
+            pass
+
+    files = []
+    for path in glob.glob(os.path.join(CACHE_DIR, '*.npy')):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    for mtime, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
@@ -1,22 +1,26 @@
 import datetime
 from bibliopixel import animation
 from bibliopixel.colors import COLORS
-from bibliopixel.animation.matrix import Matrix
+from frame import FrameMatrix
+from wonderdomicile import audio
 import math
+import numpy as np
 
-class HydroPump(Matrix):
+class HydroPump(FrameMatrix):
     def __init__(self, *args,
                  fade=0.8,
                  pump_speed=12,
                  gravity=1,
                  pipe_rate=12,
+                 audio=0,
                  **kwds):
 
-        # Fades previously lit pixels by a percentage
-        self.fade = fade
-
         self.pump_speed = pump_speed
 
+        # How much faster the water is pumped with the bass, 0 to ignore
+        # the sound
+        self.audio = audio
+
         self.gravity = gravity
 
         # number of pipes active
@@ -24,28 +28,20 @@ class HydroPump(Matrix):
 
         self.active_columns = []
         #The base class MUST be initialized by calling super like this
-        super().__init__(*args, **kwds)
+        super().__init__(*args, fade=fade, **kwds)
 
         for i in range(self.layout.width):
             # Tuple of (active, water_level)
             self.active_columns.append([False, 0])
 
 
-    # fades pixel at [i,j] by self.fade
-    def fade_pixel(self, i, j):
-        old = self.layout.get(i, j)
-        if old != (0,0,0):
-            self.layout.set(
-                i, j,
-                [math.floor(x * self.fade) for x in old]
-            )
-
     def update_water_levels(self):
         # how long to stay at peak water level
         modifier = 0
+        pump_speed = self.pump_speed * audio.intensity(self.audio, band=0)
         for c in self.active_columns:
             if c[0]:
-                c[1] += self.pump_speed
+                c[1] += pump_speed
                 if c[1] > self.layout.height + modifier:
                     c[0] = False
             else:
@@ -53,21 +49,18 @@ class HydroPump(Matrix):
                     c[1] -= int(self.pump_speed * self.gravity)
 
 
-    def step(self, amt=1):
-        newly_active = 2 * int(math.floor(self._step / self.layout.height * self.pump_speed * self.pipe_rate) % (self.layout.width / 2))
-        self.active_columns[newly_active][0] = True
-        self.active_columns[newly_active + 1][0] = True
+    def render(self, amt=1):
+        # Water is pumped up all the strips of one side at a time
+        face = self.geometry.face[:, 0]
+        faces = self.geometry.columns * self.geometry.sides
+        newly_active = int(math.floor(self._step / self.layout.height * self.pump_speed * self.pipe_rate)) % faces
+        for x in np.flatnonzero(face == newly_active):
+            self.active_columns[x][0] = True
 
         self.update_water_levels()
+        colors = self.palette_colors(self._step + 50 * face)
         for i in range(self.layout.width):
-            color = self.palette(self._step + 50 * math.floor(i/2))
-            for j in range(self.layout.height):
-                if j > self.layout.height - self.active_columns[i][1]:
-                    self.layout.set(i, j, color)
-                else:
-                    if self.fade < 1:
-                        self.fade_pixel(i, j)
-                    else:
-                        self.layout.set(i, j, (0,0,0))
+            lit = self.ys > self.layout.height - self.active_columns[i][1]
+            self.frame[i, lit] = colors[i]
 
         self._step += amt
@@ -1,26 +1,17 @@
 import datetime
 from bibliopixel import animation
 from bibliopixel.colors import COLORS
-from bibliopixel.animation.matrix import Matrix
+from frame import FrameMatrix
 from bibliopixel.colors import hue2rgb
-from multiprocessing import pool
 
-class MultiProcessingTest(Matrix):
-    def __init__(self, *args, **kwds):
-        self.p = pool.Pool(4)
-        self.mp = True
-        super().__init__(*args, **kwds)
+class MultiProcessingTest(FrameMatrix):
+    def __init__(self, *args, worker=True, **kwds):
+        # Renders in its own process unless worker is False, see worker.py
+        super().__init__(*args, worker=worker, **kwds)
 
-    def step(self, amt=1):
-        if self.mp:
-            results = [self.p.apply(mptest, args=(i,self._step)) for i in range(self.layout.width)]
-            for i,r in enumerate(results):
-                for j in range(self.layout.height):
-                    self.layout.set(i,j,r)
-        else:
-            for i in range(self.layout.width):
-                for j in range(self.layout.height):
-                    self.layout.set(i,j,self.palette(i*1 + self._step))
+    def render(self, amt=1):
+        for i in range(self.layout.width):
+            self.frame[i, :] = mptest(i, self._step)
 
         self._step += amt
 
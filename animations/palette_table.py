@@ -0,0 +1,82 @@
+"""
+Palettes compiled into uint8 lookup tables, so a whole array of palette
+positions turns into colors with one numpy indexing operation.
+"""
+
+import math
+
+import numpy as np
+
+# Minimum number of table entries per cycle of the palette
+MIN_SIZE = 256
+
+_TABLES = {}
+
+
+class PaletteTable:
+    def __init__(self, palette):
+        self.palette = palette
+
+        # The palette repeats itself every `period` positions
+        self.period = palette_period(palette)
+
+        if self.period == round(self.period):
+            # Whole number of samples per position, so at integer positions
+            # the table gives exactly what palette() would
+            per_position = math.ceil(MIN_SIZE / self.period)
+            size = int(round(self.period)) * per_position
+        else:
+            size = MIN_SIZE
+
+        self.scale = size / self.period
+        positions = np.arange(size) / self.scale
+        self.table = np.array([palette(p) for p in positions], np.uint8)
+
+    def __call__(self, positions):
+        """
+        :param positions: scalar or array of palette positions
+        :return: uint8 array of shape positions.shape + (3,)
+        """
+        index = np.floor(np.asarray(positions) * self.scale).astype(np.intp)
+        index %= len(self.table)
+        return self.table[index]
+
+
+def table_for(palette):
+    """
+    :return: the PaletteTable for this palette, compiling it the first time
+        a palette with the same configuration is seen
+    """
+    key = palette_key(palette)
+    table = _TABLES.get(key)
+    if table is None:
+        table = _TABLES[key] = PaletteTable(palette)
+    return table
+
+
+def palette_key(palette):
+    return (tuple(tuple(c) for c in palette), palette.continuous,
+            palette.serpentine, palette.scale, palette.offset,
+            palette.autoscale, palette.length)
+
+
+def palette_period(palette):
+    """
+    :return: how many positions it takes the palette to repeat itself
+    """
+    n = len(palette)
+
+    if not palette.serpentine:
+        cycle = n
+    elif palette.continuous:
+        cycle = 2 * n
+    else:
+        cycle = 2 * n - 2
+
+    speed = palette.scale
+    if palette.length and palette.autoscale:
+        speed *= n / palette.length
+
+    if n == 1 or not speed:
+        return 1
+    return cycle / abs(speed)
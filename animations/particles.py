@@ -0,0 +1,131 @@
+"""
+Sparse particle system, kept as one numpy array per property.
+
+Only the live particles are stored, so moving and drawing them costs in
+proportion to how many there are rather than to the size of the frame.
+Spawning takes whole arrays at once, so a random number of particles at
+random places is a couple of vectorized draws.
+"""
+
+import numpy as np
+
+# Property name, numpy type and the shape of one particle's value
+FIELDS = (
+    ('x', float, ()),
+    ('y', float, ()),
+    ('vx', float, ()),
+    ('vy', float, ()),
+    ('age', float, ()),
+    ('life', float, ()),
+    ('color', np.uint8, (3,)),
+)
+
+
+def _field(name):
+    def get(self):
+        return self.arrays[name][:self.count]
+
+    def set(self, value):
+        self.arrays[name][:self.count] = value
+
+    return property(get, set, doc='%s of each live particle' % name)
+
+
+class Particles:
+    x = _field('x')
+    y = _field('y')
+    vx = _field('vx')
+    vy = _field('vy')
+    age = _field('age')
+    life = _field('life')
+    color = _field('color')
+
+    def __init__(self, capacity=64):
+        # The first `count` entries of each array are the live particles
+        self.count = 0
+        self.arrays = {}
+        self._allocate(capacity)
+
+    def __len__(self):
+        return self.count
+
+    def _allocate(self, capacity):
+        old, self.arrays = self.arrays, {}
+        for name, dtype, shape in FIELDS:
+            self.arrays[name] = np.zeros((capacity,) + shape, dtype)
+            if old:
+                self.arrays[name][:self.count] = old[name][:self.count]
+
+    def spawn(self, n, x=0, y=0, vx=0, vy=0, color=(255, 255, 255),
+              life=np.inf):
+        """
+        Add n particles. Each property is one value for all of them or an
+        array with one per particle.
+        """
+        if not n:
+            return
+        start, end = self.count, self.count + n
+        capacity = len(self.arrays['x'])
+        if end > capacity:
+            self._allocate(max(end, 2 * capacity))
+
+        values = dict(x=x, y=y, vx=vx, vy=vy, age=0, life=life, color=color)
+        for name, value in values.items():
+            self.arrays[name][start:end] = value
+        self.count = end
+
+    def kill(self, dead):
+        """
+        Remove the particles where the bool array `dead` is True.
+        """
+        keep = ~dead
+        count = int(keep.sum())
+        if count == self.count:
+            return
+        for array in self.arrays.values():
+            array[:count] = array[:self.count][keep]
+        self.count = count
+
+    def clear(self):
+        self.count = 0
+
+    def move(self, amt=1, gravity=0):
+        """
+        Advance positions and ages by amt steps, pulling towards larger y.
+        """
+        if gravity:
+            self.vy += gravity * amt
+        self.x += self.vx * amt
+        self.y += self.vy * amt
+        self.age += amt
+
+    def expire(self):
+        """
+        Remove the particles that have outlived their life.
+        """
+        self.kill(self.age >= self.life)
+
+    def pixels(self, width, height):
+        """
+        :return: x and y pixel indices of the particles inside a frame of
+            this size, and the bool mask of which particles those are
+        """
+        x = np.rint(self.x).astype(np.intp)
+        y = np.rint(self.y).astype(np.intp)
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        return x[inside], y[inside], inside
+
+    def draw(self, frame, colors=None, blend=False):
+        """
+        Draw each particle as one pixel of a [x, y] frame.
+
+        :param colors: one color per particle, instead of their own
+        :param blend: keep the brighter of the frame and the particle in
+            each channel, instead of drawing over the frame
+        """
+        x, y, inside = self.pixels(*frame.shape[:2])
+        colors = (self.color if colors is None else colors)[inside]
+        if blend:
+            np.maximum.at(frame, (x, y), colors)
+        else:
+            frame[x, y] = colors
@@ -0,0 +1,52 @@
+"""
+Periodic patterns as precomputed per-pixel phases.
+
+A pixel is lit when (its phase + the current offset) % period is one of the
+lit phases of its group. Phases only depend on the geometry and parameters,
+so they are worked out once and every frame is a single table lookup.
+"""
+
+import numpy as np
+
+_MASKS = {}
+
+
+class PhaseMask:
+    def __init__(self, phase, period, lit, group=None):
+        """
+        :param phase: int array with the phase of each pixel
+        :param period: the pattern repeats every `period` phases
+        :param lit: for each group, the phases which are lit
+        :param group: int array like phase picking which entry of `lit`
+            each pixel uses. None puts every pixel in group 0.
+        """
+        self.period = period
+        if group is None:
+            group = np.zeros_like(phase)
+
+        # Each group gets a row of the table twice over, so adding an
+        # offset in range(period) never needs wrapping around
+        table = np.zeros((len(lit), period), bool)
+        for g, phases in enumerate(lit):
+            table[g, np.asarray(phases, int) % period] = True
+        self.table = np.tile(table, 2).ravel()
+
+        self.base = group * (2 * period) + np.mod(phase, period)
+
+    def __call__(self, offset, out=None):
+        """
+        :param out: optional bool array to write the result into
+        :return: bool array of lit pixels
+        """
+        return np.take(self.table, self.base + offset % self.period, out=out)
+
+
+def phase_mask(key, make):
+    """
+    :param key: hashable description of everything the pattern depends on
+    :param make: called to build the PhaseMask the first time key is seen
+    """
+    mask = _MASKS.get(key)
+    if mask is None:
+        mask = _MASKS[key] = make()
+    return mask
@@ -0,0 +1,72 @@
+"""
+Plays back a file made by the wonderdomicile.recorder.Recorder driver, with
+the same timing it was recorded with. The file is memory mapped, so each
+frame is just a copy into the layout.
+"""
+
+import numpy as np
+from bibliopixel.animation.matrix import Matrix
+
+from wonderdomicile import recorder
+
+# Longest a frame is shown for, in seconds of the recording. A recording with
+# several sessions appended to it has the time between them as a gap.
+MAX_GAP = 1
+
+
+class Playback(Matrix):
+    def __init__(self, *args, path, loop=True, speed=1, max_gap=MAX_GAP,
+                 **kwds):
+        # The recording to play
+        self.path = path
+
+        # Start again from the beginning at the end, otherwise the
+        # animation completes
+        self.loop = loop
+
+        # 2 plays twice as fast
+        self.speed = speed
+
+        # Longer gaps between frames are cut down to this
+        self.max_gap = max_gap
+
+        super().__init__(*args, **kwds)
+
+        self.frames = recorder.load(path)
+        if not len(self.frames):
+            raise ValueError('%s has no frames' % path)
+
+        # Seconds from the first frame to each frame
+        gaps = np.clip(np.diff(self.frames['time']), 0, max_gap)
+        self.times = np.concatenate(([0], np.cumsum(gaps)))
+
+        # Recorded frames are shown for as long as the frame before them
+        self.duration = self.times[-1] + (
+            self.times[-1] - self.times[-2] if len(self.times) > 1 else 0)
+
+        self.start_time = None
+
+    def pre_run(self):
+        self.start_time = None
+
+    def step(self, amt=1):
+        now = self.time()
+        if self.start_time is None:
+            self.start_time = now
+        elapsed = (now - self.start_time) * self.speed
+
+        if elapsed >= self.duration:
+            if self.loop and self.duration:
+                elapsed %= self.duration
+            else:
+                elapsed = self.duration
+                self.completed = True
+
+        index = max(0, np.searchsorted(self.times, elapsed, 'right') - 1)
+        colors = self.frames['colors'][index][:self.layout.numLEDs]
+
+        color_list = self.layout.color_list
+        if isinstance(color_list, np.ndarray):
+            color_list[:len(colors)] = colors
+        else:
+            color_list[:len(colors)] = map(tuple, colors.tolist())
@@ -1,39 +1,44 @@
-import math
-import random
+import numpy as np
 
-from bibliopixel.animation.matrix import Matrix
+from frame import FrameMatrix
+from particles import Particles
+from wonderdomicile import audio
 
 
-class Sparkles(Matrix):
+class Sparkles(FrameMatrix):
     def __init__(self, *args,
                  fade=0.8,
                  sparkle_prob=0.0005,
+                 audio=0,
                  **kwds):
 
-        self.fade = fade
         self.sparkle_prob = sparkle_prob
 
+        # How much more it sparkles on a beat, 0 to ignore the sound
+        self.audio = audio
+
         # The base class MUST be initialized by calling super like this
-        super().__init__(*args, **kwds)
-
-    # fades pixel at [i,j] by self.fade
-    def fade_pixel(self, i, j):
-        old = self.layout.get(i, j)
-        if old != (0,0,0):
-            self.layout.set(
-                i, j,
-                [math.floor(x * self.fade) for x in old]
-            )
-
-    def step(self, amt=1):
-        for i in range(self.layout.width):
-            # color = self.palette(self._step + 50 * math.floor(i / 2))
-            for j in range(self.layout.height):
-                # color = self.palette(random.randint(0, 255))
-                color = (255,255,255)
-                self.fade_pixel(i, j)
-
-                if random.random() < self.sparkle_prob:
-                    self.layout.set(i, j, color)
+        super().__init__(*args, fade=fade, **kwds)
+
+        # Sparkles only last the frame they light up in, fading the frame
+        # does the rest
+        self.particles = Particles()
+
+    def render(self, amt=1):
+        # color = self.palette(random.randint(0, 255))
+        color = (255,255,255)
+
+        # How many pixels light up, then which ones, rather than a random
+        # number for every pixel
+        pixels = self.width * self.height
+        prob = min(1, self.sparkle_prob * audio.intensity(self.audio))
+        count = np.random.binomial(pixels, prob)
+        lit = np.random.randint(pixels, size=count)
+
+        self.particles.spawn(count, x=lit // self.height, y=lit % self.height,
+                             color=color, life=amt)
+        self.particles.draw(self.frame)
+        self.particles.move(amt)
+        self.particles.expire()
 
         self._step += amt
@@ -1,10 +1,11 @@
 import math
 from bibliopixel import animation
 from bibliopixel.colors import COLORS
-from bibliopixel.animation.matrix import Matrix
+from frame import FrameMatrix
+import frame_cache, phase
 
 # Like chase, but horizontal
-class Spiral(Matrix):
+class Spiral(FrameMatrix):
     def __init__(self, *args,
                  fade=0.5,
                  length=16,
@@ -14,39 +15,29 @@ class Spiral(Matrix):
         # Length of the chase
         self.length = length
 
-        # Fades previously lit pixels by a percentage
-        self.fade = fade
-
         # Length of empty space between each chase. Likely to look best as a multiple of 8
         self.spacing = spacing
 
-        super().__init__(*args, **kwds)
+        super().__init__(*args, fade=fade, **kwds)
+
+    def pattern(self):
+        key = ('Spiral', self.width, self.height, self.spacing, self.length)
+        return phase.phase_mask(key, self.make_pattern)
 
-    def step(self, amt=1):
+    def make_pattern(self):
+        pos = self.xs[:, None] + self.width * self.ys[None, :]
+        return phase.PhaseMask(pos, self.spacing, [range(self.length)])
+
+    def render(self, amt=1):
         color = self.palette(self._step)
 
-        for i in range(self.layout.width):
-            for j in range(self.layout.height):
-                pos = i + 16 * j - self._step
-
-                if pos % self.spacing in range(self.length):
-                    self.layout.set(i, j, color)
-                else:
-                    if self.fade < 1:
-                        old = self.layout.get(i, j)
-                        if old != (0,0,0):
-                            self.layout.set(
-                                i, j,
-                                fade_by(old, self.fade))
-                    else:
-                        self.layout.set(i, j, (0,0,0))
+        lit = self.pattern()(-self._step)
+        self.paint(lit, color)
 
         self._step += amt
 
-def fade_by(color, level):
-    """
-    Fades RGB tuple by percentage, 0 - 100
-    """
-    return map(lambda x: math.floor(x * level), color)
-
+    def period(self):
+        return frame_cache.lcm(self.spacing, self.palette_period())
 
+    def cache_params(self):
+        return self.spacing, self.length
@@ -0,0 +1,124 @@
+"""
+Shapes rasterized once into small bitmaps, and stamped into a frame's mask
+at any number of places at once.
+
+A Sprite keeps the offsets of its pixels from its corner, so stamping it at
+N places is a single assignment of N times its pixels: the cost depends on
+the shapes drawn, not on the size of the frame. Stamps that go over the
+side of the frame wrap around to the other side, like going around the
+sculpture, and stamps that go over the top or bottom are clipped.
+"""
+
+import numpy as np
+
+
+class Sprite:
+    def __init__(self, bitmap):
+        """
+        :param bitmap: bool array indexed [x, y] like a frame, True where
+            the shape is
+        """
+        self.bitmap = np.asarray(bitmap, bool)
+        self.dx, self.dy = np.nonzero(self.bitmap)
+
+    @property
+    def shape(self):
+        return self.bitmap.shape
+
+    def mirror(self):
+        """
+        :return: the sprite flipped left to right
+        """
+        return Sprite(self.bitmap[::-1])
+
+    def flip(self):
+        """
+        :return: the sprite flipped upside down
+        """
+        return Sprite(self.bitmap[:, ::-1])
+
+    def stamp(self, mask, xs, ys, wrap_x=True, wrap_y=False):
+        """
+        Set the sprite's pixels in a (width, height) bool mask, with its
+        corner at each [x, y] of xs and ys, which broadcast together.
+
+        :param wrap_x: wrap around from the last column to the first,
+            otherwise clip
+        :param wrap_y: the same for the rows
+        """
+        xs, ys = np.broadcast_arrays(xs, ys)
+        x = np.reshape(xs, (-1, 1)) + self.dx
+        y = np.reshape(ys, (-1, 1)) + self.dy
+
+        # Flat indices into the mask, which is quicker than indexing by x
+        # and y
+        width, height = mask.shape
+        inside = True
+        if wrap_x:
+            x %= width
+        else:
+            inside = (x >= 0) & (x < width)
+        if wrap_y:
+            y %= height
+        else:
+            inside = inside & (y >= 0) & (y < height)
+
+        index = x * height + y
+        if inside is not True:
+            index = index[inside]
+        np.put(mask, index, True)
+
+
+def group(placements):
+    """
+    :param placements: (sprite, xs) pairs
+    :return: one Sprite of each sprite at each of its columns, to stamp
+        them all at once
+    """
+    width = max(max(xs, default=0) + sprite.shape[0]
+                for sprite, xs in placements)
+    height = max(sprite.shape[1] for sprite, xs in placements)
+    bitmap = np.zeros((width, height), bool)
+    for sprite, xs in placements:
+        for x in xs:
+            w, h = sprite.shape
+            bitmap[x:x + w, :h] |= sprite.bitmap
+    return Sprite(bitmap)
+
+
+def triangle(size):
+    """
+    A triangle across two columns, pointing right: a long edge of `size`
+    pixels in the first and the middle size - 2 in the second.
+    """
+    bitmap = np.zeros((2, size), bool)
+    bitmap[0] = True
+    bitmap[1, 1:-1] = True
+    return Sprite(bitmap)
+
+
+def chevron(width, thickness=1):
+    """
+    A V across `width` columns, `thickness` pixels thick, pointing down.
+    """
+    depth = np.abs(2 * np.arange(width) - (width - 1)) // 2
+    rows = np.arange(depth.max() + thickness)
+    bitmap = (rows >= depth[:, None]) & (rows < depth[:, None] + thickness)
+    return Sprite(bitmap)
+
+
+def bar(width, height):
+    """
+    A solid rectangle.
+    """
+    return Sprite(np.ones((width, height), bool))
+
+
+def rows(start, period, extent, height):
+    """
+    :return: the first rows of a sprite `extent` pixels tall, repeated
+        every `period` rows from `start`, for every copy that overlaps a
+        column `height` pixels tall
+    """
+    first = start % period - period * -(-extent // period)
+    return np.arange(first, height, period)
@@ -1,9 +1,9 @@
 import math
+import numpy as np
 from bibliopixel import animation
 from bibliopixel.colors import COLORS
-from bibliopixel.animation.matrix import Matrix
-
-from bibliopixel.util import log
+from frame import FrameMatrix
+import phase
 
 """
 Cool little running pixel pattern with a surprise at the end.
@@ -12,57 +12,51 @@ Cool little running pixel pattern with a surprise at the end.
 BLACK = (0,0,0)
 
 
-class Streaker(Matrix):
+class Streaker(FrameMatrix):
     def __init__(self, *args, fade=0.99, **kwds):
 
-        # Fades previously lit pixels by a percentage
-        self.fade = fade
-
-        super().__init__(*args, **kwds)
+        super().__init__(*args, fade=fade, **kwds)
         self.layout.set_brightness(255)
 
-
-    # fades pixel at [i,j] by self.fade
-    def fade_pixel(self, i, j):
-        old = self.layout.get(i, j)
-        if old != (0,0,0):
-            self.layout.set(
-                i, j,
-                [math.floor(x * self.fade) for x in old]
-            )
-
-    def step(self, amt=1):
+    def render(self, amt=1):
         self._step += amt
         color = self.palette(self._step)
 
-        for i in range(self.layout.width):
-            for j in range(self.layout.height):
-                if self.fade < 1:
-                    self.fade_pixel(i, j)
-                else:
-                    self.layout.set(i, j, BLACK)
-
         pos = self._step % (self.layout.height * self.layout.width)
         height, width = divmod(pos, self.layout.height)
         if width == 0:
-            self.layout.fill(color)
-        log.error((height, width, color))
-        self.layout.set(height, width, color)
+            self.frame[:] = color
+        self.frame[height, width] = color
 
 
-class MicroSeizure(Matrix):
-    def __init__(self, *args, wait=100, **kwargs):
+class MicroSeizure(FrameMatrix):
+    def __init__(self, *args, wait=100, **kwds):
         self.wait = wait
         super().__init__(*args, **kwds)
 
-    def step(self, amt=1):
+    def render(self, amt=1):
         self._step += amt
 
         if self._step % self.wait == 0:
-            self.layout.fill((255, 255, 0))
+            self.frame[:] = (255, 255, 0)
         elif self._step % self.wait == 1:
-            self.layout.fill((0, 255, 255))
+            self.frame[:] = (0, 255, 255)
         elif self._step % self.wait == 2:
-            self.layout.fill((255, 0, 255))
+            self.frame[:] = (255, 0, 255)
         elif self._step % self.wait == 3:
-            self.layout.fill((0, 0, 0))
+            self.frame[:] = (0, 0, 0)
+
+    def firmware_step(self, amt=1):
+        # render() moves on before drawing
+        return self._step + amt
+
+    def program(self):
+        # The colors as a table, indexed by the step
+        table = np.zeros((self.wait, 3), np.uint8)
+        colors = (255, 255, 0), (0, 255, 255), (255, 0, 255), (0, 0, 0)
+        for i, color in reversed(list(enumerate(colors))):
+            table[i % self.wait] = color
+
+        flashes = range(min(len(colors), self.wait))
+        mask = phase.PhaseMask(np.zeros(self.frame.shape[:2], int), self.wait, [flashes])
+        return self.firmware_program(0, 1, mask, table=table)
@@ -1,12 +1,14 @@
 import math
+import numpy as np
 from bibliopixel import animation
 from bibliopixel.colors import COLORS
-from bibliopixel.animation.matrix import Matrix
+from frame import FrameMatrix
+import sprite
 
-# BUG: spacing at 0 should just look completely solid, but there is a gap.
-
-# "Triangles" that move up and down the columns
-class Triangles(Matrix):
+# "Triangles" that move up and down the columns. Each pair of columns has
+# pairs of triangles, the first with its long edge in the left column and
+# the second with its long edge in the right one, `spacing` pixels apart.
+class Triangles(FrameMatrix):
     def __init__(self, *args,
                  share_edge=True,
                  size=3,
@@ -35,42 +37,46 @@ class Triangles(Matrix):
         # Number of steps before blinking
         self.blink_steps = blink_steps
 
-        # Fades previously lit pixels by a percentage
-        self.fade = fade
-
         # Internal variables
         self.block = None
-        self.long_edge = None
-        self.short_edge = None
-        self.long_edge2 = None
-        self.short_edge2 = None
+        self.second_row = None
         self.blink_incr = 0
         self.blink_switch = True
         self.calculate_internal_vars()
-        super().__init__(*args, **kwds)
+        super().__init__(*args, fade=fade, **kwds)
+
+        # Sprites of the first and second triangles of every pair of columns
+        self.first = None
+        self.second = None
+        self.make_sprites()
+
+        # Pixels lit this frame
+        self.lit = np.zeros((self.width, self.height), bool)
 
     def calculate_internal_vars(self):
-        self.long_edge = list(range(self.size))
-        self.short_edge = [x + len(self.long_edge) + self.spacing for x in list(range(self.size - 2))]
-        self.short_edge2 = list(range(self.size - 2))
-        self.long_edge2 = [x + len(self.short_edge2) + self.spacing for x in list(range(self.size))]
+        # The short edge is the middle of the long one
+        short = max(0, self.size - 2)
+
+        # Rows taken by each pair of triangles and the gaps after them, and
+        # the row the second triangle starts on
+        self.block = self.size + short + 2 * self.spacing + self.group_spacing
+        self.second_row = short + 1 + self.spacing
 
-        self.block = len(self.long_edge) + len(self.short_edge) + 2 * self.spacing + self.group_spacing
+    def make_sprites(self):
+        right = sprite.triangle(self.size)
+        left = right.mirror()
 
+        # First column of each pair, and whether it shows the left side
+        xs = np.flatnonzero(self.geometry.strip[:, 0] % 2 == 0)
+        forward = xs[self.left_columns()[xs]]
+        backward = xs[~self.left_columns()[xs]]
 
-    # fades pixel at [i,j] by self.fade
-    def fade_pixel(self, i, j):
-        old = self.layout.get(i, j)
-        if old != (0,0,0):
-            self.layout.set(
-                i, j,
-                [math.floor(x * self.fade) for x in old]
-            )
+        self.first = sprite.group([(right, forward), (left, backward)])
+        self.second = sprite.group([(left, forward), (right, backward)])
 
-    def step(self, amt=1):
+    def render(self, amt=1):
         self._step += amt
         color = self.palette(self._step)
-        black = (0,0,0)
 
         if self.blink:
             blink_side = math.floor(self._step / self.blink_steps) % 2 == 0
@@ -79,66 +85,30 @@ class Triangles(Matrix):
                 if blink_side:
                     self.blink_incr += (self.size - 1) * 2
 
-            for i in range(self.layout.width):
-                if self.share_edge:
-                    left = (math.floor(i/2) + i) % 2 == 0
-                else:
-                    left = i % 2 == 0
-
-                for j in range(self.layout.height):
-                    pos = j + self.blink_incr
-                    if left:
-                        # left side of column
-                        if blink_side and pos % self.block in self.short_edge:
-                            self.layout.set(i, j, color)
-                        elif not blink_side and pos % self.block in self.long_edge:
-                            self.layout.set(i, j, color)
-                        else:
-                            if self.fade < 1:
-                                self.fade_pixel(i, j)
-                            else:
-                                self.layout.set(i, j, (0,0,0))
-                    else:
-                        # right side of column
-                        if blink_side and (pos - 1) % self.block in self.long_edge2:
-                            self.layout.set(i, j, color)
-                        elif not blink_side and (pos - 1) % self.block in self.short_edge2:
-                            self.layout.set(i, j, color)
-                        else:
-                            if self.fade < 1:
-                                self.fade_pixel(i, j)
-                            else:
-                                self.layout.set(i, j, (0,0,0))
+            first, second = not blink_side, blink_side
+            offset = self.blink_incr
 
         # No blinking. Just scrolling
         else:
-            for i in range(self.layout.width):
-                if self.share_edge:
-                    left = (math.floor(i/2) + i) % 2 == 0
-                else:
-                    left = i % 2 == 0
-
-                for j in range(self.layout.height):
-                    pos = j + self._step
-                    if left:
-                        # left side of column
-                        if pos % self.block in self.short_edge:
-                            self.layout.set(i, j, color)
-                        elif pos % self.block in self.long_edge:
-                            self.layout.set(i, j, color)
-                        else:
-                            if self.fade < 1:
-                                self.fade_pixel(i, j)
-                            else:
-                                self.layout.set(i, j, (0,0,0))
-                    else:
-                        # right side of column
-                        if (pos - 1) % self.block in self.long_edge2:
-                            self.layout.set(i, j, color)
-                        elif (pos - 1) % self.block in self.short_edge2:
-                            self.layout.set(i, j, color)
-                        else:
-                            if self.fade < 1:
-                                self.fade_pixel(i, j)
-                            else:
-                                self.layout.set(i, j, (0,0,0))
+            first = second = True
+            offset = self._step
+
+        self.lit[:] = False
+        if first:
+            self.stamp(self.first, -offset)
+        if second:
+            self.stamp(self.second, self.second_row - offset)
+        self.paint(self.lit, color)
+
+    def stamp(self, triangles, start):
+        ys = sprite.rows(start, self.block, self.size, self.height)
+        triangles.stamp(self.lit, 0, ys)
+
+    # True for columns showing the left side of a triangle: the first strip
+    # of each side, or with shared edges the first strip of every other side
+    # and the last of the others
+    def left_columns(self):
+        strip = self.geometry.strip[:, 0]
+        if self.share_edge:
+            return (self.geometry.face[:, 0] + strip) % 2 == 0
+        return strip % 2 == 0
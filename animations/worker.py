@@ -0,0 +1,196 @@
+"""
+Render a FrameMatrix in its own process.
+
+The worker is started from multiprocessing's fork server rather than forked
+from the running project. By the time an animation starts there are driver,
+telemetry, audio, control and prewarm threads, and a fork of a process with
+threads gets copies of their locks in whatever state they were in, which
+can deadlock it. The fork server is a fresh process with no threads, so the
+animation is sent to it pickled: a copy of everything advance() needs, with
+the layout swapped for its size.
+
+The worker renders frames ahead into a ring of frame buffers in shared
+memory, and the animation in the main process only copies the next finished
+one out. When the worker falls behind, the last frame is shown again rather
+than holding up the drivers.
+"""
+
+import multiprocessing, os, pickle, sys, threading
+
+import numpy as np
+
+from bibliopixel.util import log
+
+from wonderdomicile import audio
+
+# Frames the worker can render ahead
+DEPTH = 3
+
+# Seconds to wait for the worker to finish before killing it
+JOIN_TIMEOUT = 1
+
+# Imported once by the fork server rather than by every worker
+PRELOAD = ['numpy', 'bibliopixel.animation.matrix']
+
+# Attributes of an animation which belong to the project running it, and
+# aren't sent to the worker
+HOST_ONLY = {
+    'layout', 'project', 'runner', 'threading', 'preframe_callbacks',
+    'on_completion', 'time', '_worker', '_frame_cache', '_program',
+}
+
+
+class Shape:
+    """
+    Stands in for the layout in a worker, which only needs its size.
+    """
+
+    def __init__(self, layout):
+        self.width = layout.width
+        self.height = layout.height
+        self.numLEDs = layout.numLEDs
+
+    @property
+    def shape(self):
+        return self.width, self.height
+
+    dimensions = shape
+
+
+def detach(animation):
+    """
+    :return: the animation pickled without the parts that belong to the
+        project
+    """
+    copy = object.__new__(type(animation))
+    state = {k: v for k, v in vars(animation).items() if k not in HOST_ONLY}
+    state['layout'] = Shape(animation.layout)
+    copy.__dict__.update(state)
+    return pickle.dumps(copy, pickle.HIGHEST_PROTOCOL)
+
+
+class RenderWorker:
+    def __init__(self, animation, depth=DEPTH):
+        """
+        :param animation: FrameMatrix to render with animation.advance()
+        :param depth: number of frames in the ring
+        """
+        self.animation = animation
+        shape = (depth,) + animation.frame.shape
+
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(PRELOAD)
+
+        # Shared memory, which the fork server passes on to the worker
+        self._memory = context.RawArray('B', int(np.prod(shape)))
+        self.ring = np.frombuffer(self._memory, np.uint8).reshape(shape)
+
+        self._free = context.Semaphore(depth)
+        self._ready = context.Semaphore(0)
+        self._stop = context.Event()
+        self._amt = context.RawValue('d', 1)
+
+        self._read = 0
+        self.late = 0
+        self._starter = None
+
+        # The worker gets this process's sys.path, which only has the
+        # project's paths while the project is loading
+        for path in module_paths(type(animation), RenderWorker, audio):
+            if path not in sys.path:
+                sys.path.append(path)
+
+        self.process = context.Process(
+            target=_run, name='render %s' % animation.title, daemon=True,
+            args=(detach(animation), self._memory, shape, self._free,
+                  self._ready, self._stop, self._amt, audio.analyzer))
+
+    def start(self, wait=True):
+        """
+        :param wait: wait for the process to start, which the first time
+            includes starting the fork server, rather than starting it on a
+            thread
+        """
+        if wait:
+            self.process.start()
+        else:
+            self._starter = threading.Thread(
+                target=self.process.start, name='Start render worker',
+                daemon=True)
+            self._starter.start()
+
+    def stop(self):
+        if self._starter:
+            self._starter.join()
+        self._stop.set()
+        if self.process.pid is None:
+            # It didn't start
+            return
+        # Wake the worker up if it is waiting for a free buffer
+        self._free.release()
+        self.process.join(JOIN_TIMEOUT)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+    @property
+    def alive(self):
+        starting = self._starter and self._starter.is_alive()
+        return starting or self.process.is_alive()
+
+    def next_frame(self, frame, amt=1):
+        """
+        Copy the next rendered frame into frame, if there is one.
+
+        :param amt: passed on to the worker for the frames it renders next
+        :return: False if the worker hasn't finished it yet
+        """
+        self._amt.value = amt
+        if not self._ready.acquire(False):
+            self.late += 1
+            return False
+
+        frame[:] = self.ring[self._read % len(self.ring)]
+        self._read += 1
+        self._free.release()
+        return True
+
+
+def module_paths(*things):
+    """
+    :return: the directories to import the modules of classes and modules
+        from
+    """
+    for thing in things:
+        name = getattr(thing, '__module__', None) or thing.__name__
+        path = os.path.abspath(sys.modules[name].__file__)
+        # Up from the package's directories
+        for part in name.split('.'):
+            path = os.path.dirname(path)
+        yield path
+
+
+def _run(animation, memory, shape, free, ready, stop, amt, analyzer):
+    audio.analyzer = analyzer
+
+    # Every worker from the fork server would start with the same numbers
+    np.random.seed()
+
+    animation = pickle.loads(animation)
+    ring = np.frombuffer(memory, np.uint8).reshape(shape)
+    written = 0
+    try:
+        while True:
+            free.acquire()
+            if stop.is_set():
+                break
+            value = amt.value
+            animation.advance(int(value) if value.is_integer() else value)
+            ring[written % len(ring)] = animation.frame
+            written += 1
+            ready.release()
+
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        log.exception('Exception rendering %s', animation.title)
@@ -12,14 +12,63 @@ User defines
 #define MAX_BRIGHTNESS 255
 #define GLOBAL_BRIGHTNESS 255
 
-#define FIRMWARE_VER 3
+#define FIRMWARE_VER 7
 #define SERIALRATE 12000000 // Full USB 1.1 speed (native USB)
 
+// Set on a PIXEL_DELTA span's count when it is one color repeated
+#define RUN_FLAG 0x8000
+
+// Limits of a PROGRAM, see wonderdomicile/procedural.py
+#define MAX_PERIOD 1024
+#define MAX_GROUPS 4
+#define MAX_TABLE 1024
+
 /***************************
 LEDs Setup
 ***************************/
 CRGB leds[NUM_STRIPS * NUM_LEDS_PER_STRIP];
 
+// Frames are read into here and copied to leds to be shown, so the next
+// frame can be read while this one is still going out
+CRGB frame[NUM_STRIPS * NUM_LEDS_PER_STRIP];
+
+// False when a frame went wrong, so a delta can't be applied to it
+bool frameValid = false;
+
+/***************************
+Procedural rendering, see wonderdomicile/procedural.py
+***************************/
+#define NUM_LEDS (NUM_STRIPS * NUM_LEDS_PER_STRIP)
+
+typedef struct __attribute__((__packed__))
+{
+  uint16_t period;      // 0 lights every led every step
+  uint8_t groups;
+  uint16_t table_size;
+  uint16_t mask_speed;
+  uint8_t order[3];
+  uint16_t num_leds;
+} program_t;
+
+typedef struct __attribute__((__packed__))
+{
+  uint16_t phase;
+  uint16_t base;
+  uint16_t speed;
+  uint8_t group;
+  uint8_t color[3];
+} program_led_t;
+
+program_t program;
+uint8_t mask[MAX_GROUPS * MAX_PERIOD];
+uint8_t table[MAX_TABLE][3];
+uint8_t decay[256];
+uint8_t gamma8[256];
+program_led_t programLeds[NUM_LEDS];
+
+// False until a whole PROGRAM has been read
+bool programValid = false;
+
 /***************************
 BiblioPixel Setup
 ***************************/
@@ -32,7 +81,12 @@ namespace CMDTYPE
         BRIGHTNESS = 3,
         GETID      = 4,
         SETID      = 5,
-        GETVER     = 6
+        GETVER     = 6,
+        PIXEL_DELTA = 8,
+        PIXEL_DATA_SEQ = 9,
+        PIXEL_DELTA_SEQ = 10,
+        PROGRAM = 11,
+        TICK = 12
     };
 }
 
@@ -98,6 +152,145 @@ void setup()
     setup_leds();
 }
 
+// Read and throw away the rest of a command that couldn't be used
+inline void discard(uint16_t count)
+{
+    char scratch[64];
+    while (count > 0)
+    {
+        uint16_t n = min(count, sizeof(scratch));
+        if (Serial.readBytes(scratch, n) != n)
+            return;
+        count -= n;
+    }
+}
+
+// Only the pixels that changed since the last frame, see wonderdomicile/delta.py.
+// The payload is spans of (uint16 start, uint16 count) followed by count
+// colors, or by one color for all count pixels if RUN_FLAG is set.
+inline uint8_t readDelta(uint16_t size)
+{
+    uint16_t read = 0;
+    while (read + 4 <= size)
+    {
+        uint16_t start = 0, count = 0;
+        Serial.readBytes((char*)&start, 2);
+        Serial.readBytes((char*)&count, 2);
+        read += 4;
+
+        bool run = count & RUN_FLAG;
+        count &= ~RUN_FLAG;
+        uint16_t length = run ? 3 : count * 3;
+
+        if (read + length > size || start + count > NUM_STRIPS * NUM_LEDS_PER_STRIP)
+        {
+            discard(size - read);
+            return RETURN_CODES::ERROR_SIZE;
+        }
+
+        if (run)
+        {
+            CRGB color;
+            Serial.readBytes((char*)&color, 3);
+            for (uint16_t i = 0; i < count; i++)
+                frame[start + i] = color;
+        }
+        else
+        {
+            Serial.readBytes((char*)&frame[start], length);
+        }
+        read += length;
+    }
+
+    if (read != size)
+    {
+        discard(size - read);
+        return RETURN_CODES::ERROR_SIZE;
+    }
+    return RETURN_CODES::SUCCESS;
+}
+
+inline uint8_t readFrame(uint16_t size)
+{
+    if (size != sizeof(frame))
+    {
+        discard(size);
+        return RETURN_CODES::ERROR_SIZE;
+    }
+    if (Serial.readBytes((char*)&frame, size) != size)
+        return RETURN_CODES::ERROR_SIZE;
+    return RETURN_CODES::SUCCESS;
+}
+
+inline uint8_t readProgram(uint16_t size)
+{
+    programValid = false;
+    if (size < sizeof(program_t))
+    {
+        discard(size);
+        return RETURN_CODES::ERROR_SIZE;
+    }
+    Serial.readBytes((char*)&program, sizeof(program_t));
+    size -= sizeof(program_t);
+
+    uint32_t maskSize = (uint32_t)program.groups * program.period;
+    uint32_t expected = maskSize + program.table_size * 3 + 512 +
+        sizeof(programLeds);
+    if (program.period > MAX_PERIOD || program.groups > MAX_GROUPS ||
+        program.table_size == 0 || program.table_size > MAX_TABLE ||
+        program.order[0] > 2 || program.order[1] > 2 || program.order[2] > 2 ||
+        program.num_leds != NUM_LEDS || size != expected)
+    {
+        discard(size);
+        return RETURN_CODES::ERROR_SIZE;
+    }
+
+    Serial.readBytes((char*)mask, maskSize);
+    Serial.readBytes((char*)table, program.table_size * 3);
+    Serial.readBytes((char*)decay, 256);
+    Serial.readBytes((char*)gamma8, 256);
+    if (Serial.readBytes((char*)programLeds, sizeof(programLeds)) != sizeof(programLeds))
+        return RETURN_CODES::ERROR_SIZE;
+
+    programValid = true;
+    return RETURN_CODES::SUCCESS;
+}
+
+// Fade once for each of `steps` steps, paint the lit leds for this step and
+// write the result into frame
+inline void renderProgram(uint32_t step, uint8_t steps)
+{
+    uint16_t offset = 0;
+    if (program.period)
+        offset = (step % program.period) * program.mask_speed % program.period;
+    uint32_t tableStep = step % program.table_size;
+
+    uint8_t *out = (uint8_t*)frame;
+    for (uint16_t i = 0; i < NUM_LEDS; i++)
+    {
+        program_led_t &led = programLeds[i];
+        for (uint8_t s = 0; s < steps; s++)
+            for (uint8_t c = 0; c < 3; c++)
+                led.color[c] = decay[led.color[c]];
+
+        if (!program.period ||
+            mask[led.group * program.period + (led.phase + offset) % program.period])
+        {
+            uint16_t index = (led.base + tableStep * led.speed) % program.table_size;
+            memcpy(led.color, table[index], 3);
+        }
+
+        for (uint8_t k = 0; k < 3; k++)
+            out[3 * i + k] = gamma8[led.color[program.order[k]]];
+    }
+}
+
+inline void showFrame()
+{
+    memcpy(leds, frame, sizeof(leds));
+    LEDS.show();
+}
+
 inline void getData()
 {
     static char cmd = 0;
@@ -111,13 +304,87 @@ inline void getData()
 
         if (cmd == CMDTYPE::PIXEL_DATA)
         {
-            Serial.readBytes(((char*)&leds), size); 
+            Serial.readBytes(((char*)&frame), size); 
     
             uint8_t resp = RETURN_CODES::SUCCESS;
+            frameValid = true;
 
-            LEDS.show();
+            showFrame();
             Serial.write(resp);
         }
+        else if (cmd == CMDTYPE::PIXEL_DELTA)
+        {
+            uint8_t resp = RETURN_CODES::ERROR;
+            if (frameValid)
+                resp = readDelta(size);
+            else
+                discard(size);
+            frameValid = resp == RETURN_CODES::SUCCESS;
+
+            if (frameValid)
+                showFrame();
+            Serial.write(resp);
+        }
+        else if (cmd == CMDTYPE::PIXEL_DATA_SEQ || cmd == CMDTYPE::PIXEL_DELTA_SEQ)
+        {
+            // Ack as soon as the frame is read so the host can send the
+            // next one while this one is shown
+            uint8_t seq = 0;
+            uint8_t resp = RETURN_CODES::ERROR_SIZE;
+            if (size >= 1 && Serial.readBytes((char*)&seq, 1) == 1)
+            {
+                size -= 1;
+                if (cmd == CMDTYPE::PIXEL_DATA_SEQ)
+                    resp = readFrame(size);
+                else if (frameValid)
+                    resp = readDelta(size);
+                else
+                {
+                    discard(size);
+                    resp = RETURN_CODES::ERROR;
+                }
+            }
+            frameValid = resp == RETURN_CODES::SUCCESS;
+
+            Serial.write(resp);
+            Serial.write(seq);
+            Serial.flush();
+
+            if (frameValid)
+                showFrame();
+        }
+        else if (cmd == CMDTYPE::PROGRAM)
+        {
+            Serial.write(readProgram(size));
+        }
+        else if (cmd == CMDTYPE::TICK)
+        {
+            // Acked before rendering, like the sequenced frames
+            uint8_t seq = 0;
+            uint32_t step = 0;
+            uint8_t steps = 1;
+            uint8_t resp = RETURN_CODES::ERROR_SIZE;
+            if (size == 6)
+            {
+                Serial.readBytes((char*)&seq, 1);
+                Serial.readBytes((char*)&step, 4);
+                Serial.readBytes((char*)&steps, 1);
+                resp = programValid ? RETURN_CODES::SUCCESS : RETURN_CODES::ERROR;
+            }
+            else
+                discard(size);
+
+            Serial.write(resp);
+            Serial.write(seq);
+            Serial.flush();
+
+            if (resp == RETURN_CODES::SUCCESS)
+            {
+                renderProgram(step, steps);
+                frameValid = true;
+                showFrame();
+            }
+        }
         else if(cmd == CMDTYPE::GETID)
         {
             //flash(CRGB(0,255,0), 500, 2);
@@ -0,0 +1,6 @@
+import os, sys
+
+# The animations import each other as top level modules, the way bibliopixel
+# loads them from the project's directory
+ANIMATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'animations')
+sys.path.insert(0, os.path.abspath(ANIMATIONS))
@@ -0,0 +1,101 @@
+import unittest
+
+import numpy as np
+
+from bibliopixel.drivers.return_codes import RETURN_CODES
+from wonderdomicile import delta
+
+LEDS = 8 * 143
+
+
+def random_frame(random, leds=LEDS):
+    return random.randint(0, 256, (leds, 3)).astype(np.uint8)
+
+
+class DeltaTest(unittest.TestCase):
+    def setUp(self):
+        self.random = np.random.RandomState(23)
+
+    def round_trip(self, new, old):
+        payload = delta.encode(new, old)
+        leds = bytearray(old.tobytes())
+        self.assertEqual(delta.decode(payload, leds), RETURN_CODES.SUCCESS)
+        self.assertEqual(leds, new.tobytes())
+        return payload
+
+    def test_empty(self):
+        old = random_frame(self.random)
+        self.assertEqual(self.round_trip(old.copy(), old), b'')
+
+    def test_random(self):
+        for i in range(50):
+            old = random_frame(self.random)
+            new = old.copy()
+            changed = self.random.rand(LEDS) < self.random.rand()
+            new[changed] = random_frame(self.random, changed.sum())
+            self.round_trip(new, old)
+
+    def test_sparse(self):
+        old = random_frame(self.random)
+        new = old.copy()
+        for i in 0, 1, 17, 18, 20, 500, LEDS - 1:
+            new[i] = 255 - new[i]
+        payload = self.round_trip(new, old)
+        self.assertLess(len(payload), new.nbytes // 10)
+
+    def test_all_changed(self):
+        old = random_frame(self.random)
+        self.round_trip(255 - old, old)
+
+    def test_runs(self):
+        old = random_frame(self.random)
+        new = old.copy()
+        new[10:300] = 7, 8, 9
+        new[300:303] = 1, 2, 3
+        new[-50:] = 0
+        payload = self.round_trip(new, old)
+        self.assertLess(len(payload), 100)
+
+    def test_one_color(self):
+        old = np.zeros((LEDS, 3), np.uint8)
+        new = np.full((LEDS, 3), 255, np.uint8)
+        payload = self.round_trip(new, old)
+        self.assertEqual(len(payload), delta.SPAN.size + 3)
+
+    def test_several_bases(self):
+        # The frame last acked, and the one still on its way to the device
+        old = random_frame(self.random)
+        pending = old.copy()
+        pending[self.random.rand(LEDS) < 0.2] = 0
+        new = pending.copy()
+        new[self.random.rand(LEDS) < 0.2] = 255
+        # Back to what was acked, but not what is pending
+        new[:50] = old[:50]
+
+        payload = delta.encode(new, old, pending)
+        self.assertEqual(delta.smaller(new, old, pending), payload)
+        for base in old, pending:
+            leds = bytearray(base.tobytes())
+            self.assertEqual(delta.decode(payload, leds), RETURN_CODES.SUCCESS)
+            self.assertEqual(leds, new.tobytes())
+
+    def test_smaller(self):
+        old = random_frame(self.random)
+        new = old.copy()
+        new[100:110] = 0
+        self.assertEqual(delta.smaller(new, old), delta.encode(new, old))
+
+    def test_whole_frame_when_smaller(self):
+        old = random_frame(self.random)
+        new = random_frame(self.random)
+        self.assertGreaterEqual(len(delta.encode(new, old)), new.nbytes)
+        self.assertIsNone(delta.smaller(new, old))
+
+    def test_bad_payload(self):
+        old = random_frame(self.random)
+        new = 255 - old
+        payload = delta.encode(new, old)
+        for data in payload[:-1], payload + b'\0', delta.SPAN.pack(LEDS, 1):
+            leds = bytearray(old.tobytes())
+            code = delta.decode(data, leds)
+            self.assertEqual(code, RETURN_CODES.ERROR_SIZE)
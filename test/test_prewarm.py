@@ -0,0 +1,43 @@
+import random, unittest
+
+import numpy as np
+
+from bibliopixel.drivers.driver_base import DriverBase
+from wonderdomicile import prewarm
+from wonderdomicile.layout import Sculpture
+
+import chase, colorwave, fire, hydropump, sparkles, spiral, streaker, triangles
+
+STEPS = 50
+
+ANIMATIONS = (
+    chase.Chase, chase.ChaseUp, colorwave.Vertical, fire.Fire,
+    fire.FireSpouts, hydropump.HydroPump, sparkles.Sparkles, spiral.Spiral,
+    streaker.MicroSeizure, triangles.Triangles,
+)
+
+
+class PrewarmTest(unittest.TestCase):
+    def frames(self, cls, warm):
+        layout = Sculpture([DriverBase(num=2288)])
+        animation = cls(layout)
+        animation._set_runner({})
+        if warm:
+            prewarm.warm(animation)
+        animation._pre_run()
+        # The random numbers are the running animation's as well, so prewarm
+        # doesn't put them back
+        random.seed(0)
+        np.random.seed(0)
+        for i in range(STEPS):
+            animation.advance(1)
+            yield animation.frame.tobytes()
+
+    def test_same_frames(self):
+        for cls in ANIMATIONS:
+            with self.subTest(cls.__name__):
+                # One after the other, since they share the random numbers
+                warm = list(self.frames(cls, True))
+                cold = list(self.frames(cls, False))
+                for i, (a, b) in enumerate(zip(warm, cold)):
+                    self.assertTrue(a == b, 'step %d' % i)
@@ -0,0 +1,92 @@
+import unittest
+
+from bibliopixel.colors import make, palette
+from bibliopixel.drivers.driver_base import DriverBase
+from wonderdomicile import procedural
+from wonderdomicile.layout import Sculpture
+
+import chase, colorwave, streaker
+
+STEPS = 300
+
+# Steps per frame when a sequence skips some
+SKIPS = 1, 2, 1, 3, 1, 8
+
+COLORS = make.colors('red, yellow, green, blue, purple')
+
+# Positions 50 apart aren't the same color in these
+OTHER_COLORS = make.colors('red, green, blue')
+
+CASES = (
+    (chase.Chase, {'spacing': 30, 'alternating': 2}),
+    (chase.Chase, {'spacing': 30, 'alternating': 0,
+                   'alternating_colors': False, 'direction': 1}),
+    (chase.ChaseUp, {'spacing': 30}),
+    (colorwave.Vertical, {'bloom': True, 'color_speed': 4,
+                          'color_distance': 3}),
+    (colorwave.Vertical, {'color_speed': 2, 'color_distance': 2,
+                          'fade': 0.3}),
+    (streaker.MicroSeizure, {'wait': 10}),
+    (streaker.MicroSeizure, {'wait': 2}),
+)
+
+
+class ProceduralTest(unittest.TestCase):
+    def check(self, cls, continuous, skips=(1,), layout=None, colors=COLORS,
+              **kwds):
+        layout = layout or Sculpture([DriverBase(num=1144),
+                                      DriverBase(num=1144)])
+        animation = cls(layout, palette=palette.Palette(colors, continuous),
+                        **kwds)
+        animation._set_runner({})
+        animation._pre_run()
+
+        # Start from a frame with some history
+        for i in range(7):
+            animation.advance(1)
+
+        program = animation.program()
+        self.assertIsNotNone(program)
+        order = animation.frame_order()
+        colors = animation.frame.reshape(-1, 3)[order]
+        payload = program.encode(colors, 0, layout.numLEDs,
+                                 procedural.IDENTITY, (0, 1, 2))
+        renderer = procedural.Renderer(payload)
+
+        for i in range(STEPS):
+            amt = skips[i % len(skips)]
+            shown = renderer.tick(animation.firmware_step(amt), amt)
+            animation.advance(amt)
+            expected = animation.frame.reshape(-1, 3)[order]
+            self.assertEqual(shown, expected.tobytes(), 'step %d' % i)
+
+    def test_stepped(self):
+        for cls, kwds in CASES:
+            with self.subTest(cls.__name__, **kwds):
+                self.check(cls, False, **kwds)
+
+    def test_continuous(self):
+        for cls, kwds in CASES:
+            with self.subTest(cls.__name__, **kwds):
+                self.check(cls, True, **kwds)
+
+    def test_skipped_steps(self):
+        for cls, kwds in CASES:
+            with self.subTest(cls.__name__, **kwds):
+                self.check(cls, False, SKIPS, **kwds)
+
+    def test_other_geometry(self):
+        for cls, kwds in CASES:
+            for continuous in False, True:
+                with self.subTest(cls.__name__, continuous=continuous, **kwds):
+                    layout = Sculpture([DriverBase(num=450)], columns=3,
+                                       sides=3, strips=1, leds=50)
+                    self.check(cls, continuous, layout=layout,
+                               colors=OTHER_COLORS, **kwds)
+
+    def test_fractional_speed(self):
+        layout = Sculpture([DriverBase(num=2288)])
+        animation = colorwave.Vertical(
+            layout, palette=palette.Palette(COLORS), color_speed=2.5,
+            color_distance=0.7)
+        self.assertIsNone(animation.program())
@@ -0,0 +1,72 @@
+import os, tempfile, unittest
+
+import numpy as np
+
+from bibliopixel.drivers.driver_base import DriverBase
+from wonderdomicile import recorder
+from wonderdomicile.layout import Sculpture
+
+import playback
+
+NUM = 2288
+
+
+class RecorderTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'test.wdrec')
+
+    def record(self, values):
+        driver = recorder.Recorder(self.path, NUM)
+        colors = np.zeros((NUM, 3), np.uint8)
+        driver.set_colors(colors, 0)
+        driver.start()
+        for value in values:
+            colors[:] = value
+            driver.update_colors()
+        driver.cleanup()
+
+    def test_record(self):
+        self.record(range(5))
+        frames = recorder.load(self.path)
+        self.assertEqual(list(frames['colors'][:, 0, 0]), list(range(5)))
+
+    def test_append(self):
+        self.record(range(3))
+        self.record(range(3, 5))
+        frames = recorder.load(self.path)
+        self.assertEqual(list(frames['colors'][:, 0, 0]), list(range(5)))
+
+    def test_partial_frame(self):
+        self.record(range(3))
+        with open(self.path, 'ab') as fp:
+            fp.write(b'\xff' * 1000)
+        self.record(range(3, 5))
+
+        frames = recorder.load(self.path)
+        self.assertEqual(list(frames['colors'][:, 0, 0]), list(range(5)))
+        self.assertEqual(list(frames['colors'][:, -1, -1]), list(range(5)))
+
+    def test_partial_header(self):
+        with open(self.path, 'wb') as fp:
+            fp.write(recorder.MAGIC[:5])
+        self.record(range(2))
+        self.assertEqual(len(recorder.load(self.path)), 2)
+
+    def test_different_size(self):
+        self.record(range(2))
+        with self.assertRaises(ValueError):
+            recorder.Recorder(self.path, NUM // 2).start()
+
+    def test_playback_gap(self):
+        self.record(range(3))
+        frames = np.memmap(self.path, recorder.record_dtype(NUM), 'r+',
+                           recorder.HEADER.size)
+        frames['time'] = 0, 0.1, 1000
+        frames.flush()
+        del frames
+
+        layout = Sculpture([DriverBase(num=NUM)])
+        animation = playback.Playback(layout, path=self.path, max_gap=0.5)
+        self.assertEqual(list(animation.times), [0, 0.1, 0.6])
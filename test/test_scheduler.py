@@ -0,0 +1,58 @@
+import unittest
+
+from wonderdomicile import scheduler
+
+# Exact in binary, so that whole intervals add up exactly
+INTERVAL = 1 / 32
+
+
+class RateTest(unittest.TestCase):
+    def setUp(self):
+        self.rate = scheduler.Rate(INTERVAL)
+        self.now = 100
+
+    def steps(self, intervals):
+        self.now += intervals * INTERVAL
+        return self.rate.steps(self.now)
+
+    def test_on_time(self):
+        self.assertEqual(self.steps(0), 1)
+        for i in range(10):
+            self.assertEqual(self.steps(1), 1)
+
+    def test_late(self):
+        self.steps(0)
+        self.assertEqual(self.steps(3), 3)
+        self.assertEqual(self.steps(1), 1)
+
+    def test_early_then_late(self):
+        self.steps(0)
+        for i in range(20):
+            self.assertEqual(self.steps(0.1), 1)
+        self.assertGreaterEqual(self.rate.debt, scheduler.MIN_DEBT)
+        # Still catches up, rather than paying back the early frames
+        self.assertEqual(self.steps(4), 4)
+
+    def test_stall(self):
+        self.steps(0)
+        self.assertEqual(self.steps(100), scheduler.MAX_STEPS)
+        self.assertEqual(self.steps(1), 1)
+
+    def test_slow_down(self):
+        cost = 2 * INTERVAL
+        changes = [self.rate.add_cost(cost)
+                   for i in range(scheduler.SETTLE + 1)]
+        self.assertEqual(changes, [False] * scheduler.SETTLE + [True])
+        self.assertEqual(self.rate.divisor, 2)
+        self.assertAlmostEqual(self.rate.sleep_time, 2 * INTERVAL)
+
+    def test_max_divisor(self):
+        for i in range(10 * scheduler.SETTLE):
+            self.rate.add_cost(100 * INTERVAL)
+        self.assertEqual(self.rate.divisor, scheduler.MAX_DIVISOR)
+
+    def test_recover(self):
+        self.rate.divisor = 2
+        self.rate.settle = 0
+        self.assertTrue(self.rate.add_cost(0.1 * INTERVAL))
+        self.assertEqual(self.rate.divisor, 1)
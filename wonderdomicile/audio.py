@@ -0,0 +1,399 @@
+"""
+Sound input for animations that react to it.
+
+An Analyzer reads 16 bit mono PCM in blocks from a source on its own thread:
+the sound card through ALSA's `arecord` on the box, or a WAV file or a raw
+pipe for testing. For each block it takes one FFT of the latest samples,
+sums it into frequency bands, and detects beats as sudden rises of the bass
+over its recent average. The latest levels are published into shared memory
+without locks, which render workers are handed too (see
+animations/worker.py).
+
+Animations read them with
+
+    intensity = audio.intensity(self.audio)
+
+which never blocks, and is 1 when no analyzer is running or the sound has
+stopped. See fire.Fire, hydropump.HydroPump and sparkles.Sparkles.
+
+The sequence starts an analyzer from its `audio` parameter, a dict of
+Analyzer parameters. To see what it hears:
+
+    python -m wonderdomicile.audio alsa:default
+"""
+
+import collections, math, multiprocessing, subprocess, sys, threading, time, wave
+
+import numpy as np
+
+from bibliopixel.util import log
+
+RATE = 44100
+
+# Samples read at a time, 5.8ms at 44.1kHz. Levels are at most this old
+# plus the time to analyze them when an animation reads them.
+BLOCK = 256
+
+# Samples in each FFT, enough to tell the bass bands apart
+WINDOW = 1024
+
+# Edges of the frequency bands in Hz, the first band being the bass
+EDGES = (40, 160, 400, 1000, 2500, 6000, 16000)
+
+# Seconds each band's peak takes to fall by half, for automatic gain
+PEAK_HALF_LIFE = 4
+
+# Seconds the bass is averaged over, and how far over that average it has to
+# jump for a beat
+AVERAGE_SECONDS = 1
+BEAT_THRESHOLD = 1.6
+
+# Seconds of sound the average starts from, before any beats
+WARMUP_SECONDS = 0.2
+
+# Shortest time between beats, and the time constant a beat fades over
+MIN_BEAT_SECONDS = 0.2
+BEAT_SECONDS = 0.15
+
+# Levels older than this are treated as silence
+STALE_SECONDS = 0.5
+
+# Energy below this counts as silence, so a quiet room isn't amplified
+FLOOR = 1e-6
+
+# The latest levels, as read by animations. `bands` are 0 - 1 relative to
+# each band's recent peak, `level` is the loudest band, `beats` counts beats
+# and `beat` is 1 on a beat and fades to 0.
+Levels = collections.namedtuple('Levels', 'time level bands beats beat')
+
+# The Analyzer being listened to, None when there isn't one
+analyzer = None
+
+
+class PipeSource:
+    """
+    Raw signed 16 bit little endian mono PCM from a file or pipe.
+
+    :param path: file to read, or '-' for stdin
+    """
+
+    def __init__(self, path='-', rate=RATE):
+        self.rate = rate
+        if path == '-':
+            self.file = sys.stdin.buffer
+        else:
+            self.file = open(path, 'rb', buffering=0)
+
+    def read(self, frames):
+        """
+        :return: up to `frames` samples, fewer only at the end
+        """
+        data = bytearray()
+        while len(data) < 2 * frames:
+            chunk = self.file.read(2 * frames - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return np.frombuffer(data[:len(data) // 2 * 2], '<i2')
+
+    def close(self):
+        if self.file is not sys.stdin.buffer:
+            self.file.close()
+
+
+class AlsaSource(PipeSource):
+    """
+    Records from an ALSA device with `arecord`, with buffers of a few blocks
+    so the sound isn't held up on the way.
+    """
+
+    def __init__(self, device='default', rate=RATE, block=BLOCK):
+        self.rate = rate
+        command = [
+            'arecord', '-q', '-D', device, '-t', 'raw', '-f', 'S16_LE',
+            '-c', '1', '-r', str(rate), '--period-size=%d' % block,
+            '--buffer-size=%d' % (4 * block)]
+        self.process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, bufsize=0)
+        self.file = self.process.stdout
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+        self.file.close()
+
+
+class WavSource:
+    """
+    Plays a WAV file as if it was being recorded, in real time.
+
+    :param loop: start again from the beginning at the end
+    """
+
+    def __init__(self, path, loop=True):
+        self.wav = wave.open(path, 'rb')
+        if self.wav.getsampwidth() != 2:
+            raise ValueError('%s is not 16 bit' % path)
+        self.rate = self.wav.getframerate()
+        self.channels = self.wav.getnchannels()
+        self.loop = loop
+        self._start = None
+        self._read = 0
+
+    def read(self, frames):
+        if self._start is None:
+            self._start = time.time()
+        # Wait until the block would have been recorded
+        delay = self._start + (self._read + frames) / self.rate - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self._read += frames
+
+        data = self.wav.readframes(frames)
+        if len(data) < 2 * self.channels * frames and self.loop:
+            self.wav.rewind()
+            data += self.wav.readframes(frames - len(data) // (2 * self.channels))
+        samples = np.frombuffer(data, '<i2').reshape(-1, self.channels)
+        return samples.mean(axis=1).astype(np.int16)
+
+    def close(self):
+        self.wav.close()
+
+
+def make_source(source, rate=RATE, block=BLOCK):
+    """
+    :param source: 'alsa' or 'alsa:<device>', a .wav file, or a file or
+        pipe of raw PCM, '-' for stdin
+    """
+    if source == 'alsa' or source.startswith('alsa:'):
+        return AlsaSource(source[5:] or 'default', rate, block)
+    if source.endswith('.wav'):
+        return WavSource(source)
+    return PipeSource(source, rate)
+
+
+class Analyzer:
+    """
+    :param source: where the sound comes from, see make_source()
+    :param rate: sample rate of raw and ALSA sources
+    :param block: samples analyzed at a time
+    :param window: samples in each FFT
+    :param edges: edges of the frequency bands in Hz
+    :param floor: energy below which a band counts as silent
+    """
+
+    def __init__(self, source='alsa', rate=RATE, block=BLOCK, window=WINDOW,
+                 edges=EDGES, floor=FLOOR):
+        self.source = source
+        self.rate = rate
+        self.block = block
+        self.window = window
+        self.edges = edges
+        self.floor = floor
+
+        # The published levels: a sequence number that is odd while they
+        # are being written, then time, level, beats, the time of the last
+        # beat and the bands. The fork server passes the memory on to
+        # render workers.
+        self._size = 5 + len(edges) - 1
+        context = multiprocessing.get_context('forkserver')
+        self._memory = context.RawArray('d', self._size)
+        self._shared = np.frombuffer(self._memory, np.float64)
+        self._last = None
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._source = None
+
+        self.blocks = 0
+        self.beats = 0
+
+        # Seconds spent analyzing each block
+        self.analysis_time = 0
+
+    def __getstate__(self):
+        # A render worker's copy only reads the levels
+        state = dict(vars(self))
+        state.update(_shared=None, _stop=None, _thread=None, _source=None)
+        return state
+
+    def __setstate__(self, state):
+        vars(self).update(state)
+        self._shared = np.frombuffer(self._memory, np.float64)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='Audio', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._source:
+            self._source.close()
+        if self._thread:
+            # Reading stdin can't be interrupted
+            self._thread.join(1)
+            self._thread = None
+        log.info('audio: %d blocks, %.2fms to analyze each, %d beats',
+                 self.blocks, 1000 * self.analysis_time, self.beats)
+
+    def levels(self):
+        """
+        :return: the latest Levels, or None if there haven't been any lately
+        """
+        shared = self._shared
+        for i in range(3):
+            sequence = shared[0]
+            if sequence and not sequence % 2:
+                values = shared[1:].copy()
+                if shared[0] == sequence:
+                    self._last = values
+                    break
+        # If they were being written every time, the last ones will do
+
+        if self._last is None:
+            return None
+        published, level, beats, beat_time = self._last[:4]
+        now = time.time()
+        if now - published > STALE_SECONDS:
+            return None
+        beat = math.exp(-(now - beat_time) / BEAT_SECONDS) if beats else 0
+        return Levels(published, level, self._last[4:], int(beats), beat)
+
+    def _publish(self, level, bands, beat_time):
+        shared = self._shared
+        shared[0] += 1
+        shared[1:5] = time.time(), level, self.beats, beat_time
+        shared[5:] = bands
+        shared[0] += 1
+
+    def _run(self):
+        try:
+            self._source = make_source(self.source, self.rate, self.block)
+            self._analyze(self._source)
+        except Exception:
+            if not self._stop.is_set():
+                log.exception('audio: unable to read %s', self.source)
+
+    def _analyze(self, source):
+        rate, block = source.rate, self.block
+        samples = np.zeros(self.window, np.float32)
+        # The rising half of a Hann window, so the newest samples count the
+        # most and a beat shows up in the block it starts in
+        taper = np.hanning(2 * self.window)[:self.window].astype(np.float32)
+
+        # Index of the first FFT bin of each band, for summing them in one
+        # reduceat
+        frequencies = np.fft.rfftfreq(self.window, 1 / rate)
+        starts = np.searchsorted(frequencies, self.edges)
+        starts = np.minimum(starts, len(frequencies) - 1)
+        bands = len(self.edges) - 1
+
+        seconds = block / rate
+        peak_decay = 0.5 ** (seconds / PEAK_HALF_LIFE)
+        smoothing = min(1, seconds / AVERAGE_SECONDS)
+        floor = self.floor
+        peaks = np.full(bands, floor)
+        average = 0
+        beat_time = 0
+
+        # Blocks spent getting a first average of the bass, from a window
+        # full of sound, before looking for beats
+        warmup = -(-self.window // block) + int(WARMUP_SECONDS / seconds)
+        warmed = 0
+
+        while not self._stop.is_set():
+            data = source.read(block)
+            if not len(data):
+                break
+            start = time.time()
+
+            samples = np.roll(samples, -len(data))
+            samples[-len(data):] = data / 32768
+
+            spectrum = np.fft.rfft(samples * taper)
+            power = spectrum.real ** 2 + spectrum.imag ** 2
+            energy = np.add.reduceat(power, starts)[:bands] / self.window
+
+            peaks = np.maximum(energy, peaks * peak_decay)
+            levels = np.where(peaks > floor, energy / peaks, 0)
+
+            bass = energy[0]
+            if warmup:
+                warmup -= 1
+                warmed += 1
+                average += (bass - average) / warmed
+            elif (bass > floor and bass > BEAT_THRESHOLD * average and
+                    start - beat_time > MIN_BEAT_SECONDS):
+                self.beats += 1
+                beat_time = start
+            average += smoothing * (bass - average)
+
+            self._publish(levels.max(), levels, beat_time)
+            self.blocks += 1
+            elapsed = time.time() - start
+            self.analysis_time += 0.01 * (elapsed - self.analysis_time)
+
+
+def start(**kwds):
+    """
+    Start listening with a new Analyzer made from kwds.
+    """
+    global analyzer
+    stop()
+    analyzer = Analyzer(**kwds)
+    analyzer.start()
+    return analyzer
+
+
+def stop():
+    global analyzer
+    if analyzer:
+        analyzer.stop()
+    analyzer = None
+
+
+def levels():
+    """
+    :return: the latest Levels, or None without sound
+    """
+    return analyzer and analyzer.levels()
+
+
+def intensity(amount, band=None):
+    """
+    How much an animation should be stirred up by the sound.
+
+    :param amount: how much sound adds, 0 to ignore it
+    :param band: the band whose level adds to it, None for beats
+    :return: 1 without sound, up to 1 + amount
+    """
+    if not amount or analyzer is None:
+        return 1
+    current = analyzer.levels()
+    if current is None:
+        return 1
+    value = current.beat if band is None else current.bands[band]
+    return 1 + amount * value
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    start(source=argv[0] if argv else 'alsa')
+    try:
+        while True:
+            time.sleep(0.1)
+            current = levels()
+            if current:
+                bars = ' '.join('%-5s' % ('#' * int(5 * b)) for b in current.bands)
+                print('%s %s %4d' % (bars, '*' if current.beat > 0.5 else ' ',
+                                     current.beats))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop()
+
+
+if __name__ == '__main__':
+    main()
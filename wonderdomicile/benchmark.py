@@ -0,0 +1,251 @@
+"""
+Benchmark every animation in a project's sequence, with the parameters and
+layout from its yml but with drivers that don't send anything:
+
+    python -m wonderdomicile.benchmark wonderdomicile.yml --save baseline.json
+    python -m wonderdomicile.benchmark wonderdomicile.yml --compare baseline.json
+
+For each animation it reports the fps it could reach, the median and 99th
+percentile time of a frame (step and driver update) and the peak memory
+allocated during a frame. --compare flags anything noticeably slower than
+the baseline or too slow for the animation's fps, and exits with 1 if there
+was anything.
+
+--scale multiplies all the times, to get an idea of how an animation would do
+on the ODROID from a faster machine.
+
+--flames times a step of each of the flame simulators in animations/fire.py
+instead:
+
+    python -m wonderdomicile.benchmark --flames
+"""
+
+import argparse, json, os, platform, random, sys, time, timeit, tracemalloc
+
+import numpy as np
+import yaml
+
+from bibliopixel.drivers.driver_base import DriverBase
+from bibliopixel.project import project
+
+from . import output
+
+FRAMES = 300
+WARMUP = 20
+
+# The animations import each other as top level modules, the way bibliopixel
+# loads them from the project's directory
+ANIMATIONS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'animations')
+
+# Steps to time each flame simulator for
+FLAME_STEPS = 2000
+
+# How much slower than the baseline a frame can get before it is flagged
+THRESHOLD = 0.2
+
+
+class Null(DriverBase):
+    """
+    Driver which does everything but send the colors anywhere.
+    """
+
+    def __init__(self, *args, **kwds):
+        super().__init__(*args, **kwds)
+        self._output = output.Output(self.gamma, self.c_order)
+
+    def _compute_packet(self):
+        # Like the Teensy driver's _render()
+        self._output.set_brightness(self._brightness)
+        end = self._pos + self.numLEDs
+        self._output.render(self._colors[self._pos:end], self._buf)
+
+
+def load(path):
+    """
+    :return: the project in the yml file at `path`, with Null drivers
+    """
+    with open(path) as fp:
+        desc = yaml.safe_load(fp)
+
+    root = os.path.dirname(os.path.abspath(path))
+    if 'path' in desc:
+        desc['path'] = os.path.join(root, desc['path'])
+
+    drivers = desc.pop('drivers', None) or [desc.pop('driver')]
+    keep = 'num', 'c_order', 'gamma'
+    desc['drivers'] = [
+        dict({k: d[k] for k in keep if k in d},
+             typename='wonderdomicile.benchmark.Null')
+        for d in drivers]
+
+    animation = desc['animation']
+    animation.pop('telemetry', None)
+    # Build every animation up front, so loading isn't measured
+    animation.pop('lazy', None)
+    animation.setdefault('run', {})['threaded'] = False
+    return project.project(desc, root_file=path)
+
+
+def percentile(times, p):
+    return float(np.percentile(times, p))
+
+
+def measure(animation, frames=FRAMES, scale=1):
+    """
+    Run an animation for `frames` frames.
+
+    :return: dict of results, with times in milliseconds
+    """
+    layout = animation.layout
+    random.seed(0)
+    np.random.seed(0)
+    animation._pre_run()
+
+    def frame():
+        animation.step(animation.runner.amt)
+        layout.push_to_driver()
+
+    for i in range(WARMUP):
+        frame()
+
+    steps, times = [], []
+    for i in range(frames):
+        start = time.perf_counter()
+        animation.step(animation.runner.amt)
+        stepped = time.perf_counter()
+        layout.push_to_driver()
+        times.append(time.perf_counter() - start)
+        steps.append(stepped - start)
+
+    # A separate pass, because tracing slows everything down. Restarting
+    # tracemalloc each frame only counts what that frame allocates.
+    allocated = []
+    for i in range(min(frames, 50)):
+        tracemalloc.start()
+        frame()
+        allocated.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    times = 1000 * scale * np.array(times)
+    steps = 1000 * scale * np.array(steps)
+    return {
+        'target_fps': animation.runner.fps,
+        'fps': 1000 / times.mean(),
+        'p50': percentile(times, 50),
+        'p99': percentile(times, 99),
+        'step_p50': percentile(steps, 50),
+        'step_p99': percentile(steps, 99),
+        'allocated': int(np.mean(allocated)),
+    }
+
+
+def run(path, frames=FRAMES, scale=1, only=()):
+    results = {}
+    for animation in load(path).animation.animations:
+        name = animation.name or animation.title
+        if only and name not in only:
+            continue
+        if type(animation).__name__ == 'Failed':
+            print('%s: failed to load, skipping' % name, file=sys.stderr)
+            continue
+        results[name] = measure(animation, frames, scale)
+    return results
+
+
+def flames(width=16, height=143, steps=FLAME_STEPS, file=sys.stdout):
+    """
+    Time a step of each flame simulator at the sculpture's size.
+    """
+    if ANIMATIONS not in sys.path:
+        sys.path.insert(0, ANIMATIONS)
+    import fire
+
+    for simulator in fire.FlameSimulator, fire.InPlaceFlameSimulator:
+        simulation = simulator(width, height)
+        seconds = timeit.timeit(simulation.step, number=steps)
+        print('%s: %.3fms per step' % (
+            simulator.__name__, 1000 * seconds / steps), file=file)
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    :return: list of (name, problem) for each regression
+    """
+    problems = []
+    for name, result in sorted(results.items()):
+        if result['fps'] < result['target_fps']:
+            problems.append((name, '%.1f fps, below the target of %.1f' % (
+                result['fps'], result['target_fps'])))
+
+        old = baseline.get(name)
+        if not old:
+            continue
+        for key in 'p50', 'p99':
+            if result[key] > old[key] * (1 + threshold):
+                problems.append((name, '%s %.2fms, was %.2fms' % (
+                    key, result[key], old[key])))
+        if result['allocated'] > max(1024, old['allocated'] * (1 + threshold)):
+            problems.append((name, 'allocates %d bytes a frame, was %d' % (
+                result['allocated'], old['allocated'])))
+    return problems
+
+
+def print_results(results, file=sys.stdout):
+    print('%-16s %8s %8s %8s %8s %8s %10s' % (
+        'animation', 'fps', 'target', 'p50 ms', 'p99 ms', 'step ms', 'bytes'),
+        file=file)
+    for name, r in sorted(results.items()):
+        print('%-16s %8.1f %8.1f %8.2f %8.2f %8.2f %10d' % (
+            name, r['fps'], r['target_fps'], r['p50'], r['p99'],
+            r['step_p50'], r['allocated']), file=file)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('project', nargs='?', default='wonderdomicile.yml')
+    parser.add_argument('--frames', type=int, default=FRAMES)
+    parser.add_argument(
+        '--scale', type=float, default=1,
+        help='multiply all times by this, e.g. how much slower the ODROID is')
+    parser.add_argument('--only', nargs='*', default=(),
+                        help='names of the animations to run')
+    parser.add_argument('--save', help='write the results to this file')
+    parser.add_argument('--compare', help='baseline file to compare with')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--flames', action='store_true',
+                        help='time the flame simulators instead')
+    args = parser.parse_args(args)
+
+    if args.flames:
+        flames()
+        return 0
+
+    results = run(args.project, args.frames, args.scale, args.only)
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w') as fp:
+            json.dump({
+                'machine': platform.machine(),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'scale': args.scale,
+                'animations': results,
+            }, fp, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        if baseline.get('scale', 1) != args.scale:
+            print('Baseline was run with --scale %s' % baseline['scale'],
+                  file=sys.stderr)
+        problems = compare(results, baseline['animations'], args.threshold)
+        for name, problem in problems:
+            print('%s: %s' % (name, problem))
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Blend whole frames of colors together with numpy, for layering animations
+and crossfading between them.
+
+Everything is integer math on uint8 colors: an alpha of 0 to 1 becomes a
+weight of 0 to 256, products fit in uint16, and dividing by 256 is a shift.
+"""
+
+import numpy as np
+
+MODES = 'alpha', 'add', 'max', 'multiply'
+
+
+def weight(alpha):
+    """
+    :return: alpha from 0 to 1 as an integer weight from 0 to 256
+    """
+    return min(256, max(0, int(round(alpha * 256))))
+
+
+def blend(under, over, mode='alpha', alpha=1, key=False, out=None):
+    """
+    Blend the uint8 colors `over` on top of `under`, which have the same
+    shape.
+
+    :param str mode: one of MODES.
+        ``alpha`` mixes `over` into `under` in proportion to `alpha`.
+        ``add`` adds `over`, clipped to 255.
+        ``max`` keeps the brighter of the two in each channel.
+        ``multiply`` darkens `under` where `over` is dark.
+    :param alpha: opacity of `over` from 0 to 1, for every mode
+    :param key: black pixels of `over` leave `under` as it is
+    :param out: uint8 array for the result, which can be `under`
+    :return: `out`, or a new array
+    """
+    if out is None:
+        out = np.empty_like(under)
+    a = weight(alpha)
+
+    if mode == 'alpha':
+        if a == 256:
+            result = over
+        else:
+            result = under.astype(np.uint16) * (256 - a)
+            result += over.astype(np.uint16) * a
+            result >>= 8
+
+    else:
+        if a == 256:
+            scaled = over
+        else:
+            scaled = over.astype(np.uint16) * a
+            scaled >>= 8
+
+        if mode == 'add':
+            result = under.astype(np.uint16) + scaled
+            np.minimum(result, 255, out=result)
+
+        elif mode == 'max':
+            result = np.maximum(under, scaled)
+
+        elif mode == 'multiply':
+            # Mixing towards white where alpha is partial
+            factor = scaled.astype(np.uint16) + (256 - a) * 255 // 256 + 1
+            result = under.astype(np.uint16) * factor
+            result >>= 8
+
+        else:
+            raise ValueError('Unknown blend mode %s' % mode)
+
+    if key:
+        np.copyto(out, under, casting='unsafe')
+        np.copyto(out, result, casting='unsafe', where=over.any(-1)[..., None])
+    else:
+        np.copyto(out, result, casting='unsafe')
+    return out
+
+
+def to_array(color_list):
+    """
+    :return: a uint8 copy of a layout's color_list, as a (n, 3) array
+    """
+    return np.array(color_list, np.uint8).reshape(-1, 3)
+
+
+def assign(color_list, colors):
+    """
+    Copy a (n, 3) array of colors back into a layout's color_list.
+    """
+    if isinstance(color_list, np.ndarray):
+        color_list[:len(colors)] = colors
+    else:
+        color_list[:len(colors)] = map(tuple, colors.tolist())
@@ -0,0 +1,180 @@
+"""
+Start a project as quickly as possible, for the boot service:
+
+    python -m wonderdomicile.boot wonderdomicile.yml --report /var/tmp/boot.json
+
+It runs the project like `bp wonderdomicile.yml`, except that
+
+- the parsed yml is kept in CONFIG_DIR and read from there until the yml
+  changes, which skips yaml parsing
+- every pixel shows FIRST_COLOR as soon as the drivers and layout are built,
+  before the animation has even been imported
+- it logs how long each part of starting up took, from the process starting
+  to the first frame of the animation, and writes it as JSON with --report
+
+With `lazy: true` on the sequence, only the first animation is imported and
+built before it starts, see wonderdomicile/lazy.py.
+"""
+
+import time
+
+# Before importing anything heavy, so that importing is counted
+START = time.time()
+
+import argparse, hashlib, json, os, pickle
+
+from bibliopixel.project import project
+from bibliopixel.util import data_file, log
+
+CONFIG_DIR = os.path.expanduser('~/.cache/wonderdomicile/config')
+
+# Shown until the first frame of the animation, dim so it doesn't flash
+FIRST_COLOR = (8, 4, 0)
+
+
+def process_start():
+    """
+    :return: the time the process started, or None if /proc can't tell
+    """
+    try:
+        with open('/proc/self/stat') as fp:
+            # The start time is the 22nd field, and the 2nd can contain spaces
+            ticks = int(fp.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as fp:
+            uptime = float(fp.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return time.time() - uptime + ticks / os.sysconf('SC_CLK_TCK')
+
+
+class Startup:
+    """
+    Times the parts of starting up, one after the other.
+    """
+
+    def __init__(self, start=START):
+        self.start = start
+        self.last = start
+        self.phases = []
+
+        started = process_start()
+        if started is not None and started < start:
+            self.phases.append(('python', start - started))
+
+    def mark(self, name):
+        """
+        Record that the part called `name` ended now.
+        """
+        now = time.time()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def report(self):
+        return {
+            'total': sum(t for name, t in self.phases),
+            'phases': [{'name': name, 'time': t} for name, t in self.phases]}
+
+    def log(self):
+        report = self.report()
+        for phase in report['phases']:
+            log.info('startup: %-22s %7.3fs', phase['name'], phase['time'])
+        log.info('startup: %-22s %7.3fs', 'total', report['total'])
+
+
+def load_config(path, cache_dir=CONFIG_DIR):
+    """
+    Load a project's yml or json file, from the cache if it hasn't changed.
+
+    :return: the project description and whether it came from the cache
+    """
+    stat = os.stat(path)
+    stamp = stat.st_mtime_ns, stat.st_size
+    name = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+    cache = os.path.join(cache_dir, name + '.pickle')
+
+    try:
+        with open(cache, 'rb') as fp:
+            cached_stamp, desc = pickle.load(fp)
+        if cached_stamp == stamp:
+            return desc, True
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        pass
+
+    desc = data_file.load(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Written next to the cache and moved into place, so a power cut
+        # can't leave half a file
+        temp = cache + '.tmp'
+        with open(temp, 'wb') as fp:
+            pickle.dump((stamp, desc), fp, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, cache)
+    except OSError as e:
+        log.warning('Unable to cache %s: %s', path, e)
+    return desc, False
+
+
+def first_light(layout, color=FIRST_COLOR):
+    """
+    Show one color on every pixel, which costs nothing to compute.
+    """
+    layout.all_off()
+    if any(color):
+        layout.fill(color)
+    layout.push_to_driver()
+
+
+def run(path, report=None, cache=True):
+    startup = Startup()
+    startup.mark('imports')
+
+    if cache:
+        desc, cached = load_config(path)
+    else:
+        desc, cached = data_file.load(path), False
+    startup.mark('config (cached)' if cached else 'config')
+
+    p = project.project(desc, root_file=os.path.abspath(path))
+    startup.mark('project')
+
+    # Before the project starts the drivers' threads, so this goes out
+    # right away
+    first_light(p.layout)
+    startup.mark('first light')
+
+    frames = 0
+
+    def first_frame():
+        # Called before every frame, so the second call is the end of the
+        # first one
+        nonlocal frames
+        frames += 1
+        if frames == 2:
+            startup.mark('first frame')
+            startup.log()
+            if report:
+                with open(report, 'w') as fp:
+                    json.dump(startup.report(), fp, indent=2)
+
+    p.animation.preframe_callbacks.append(first_frame)
+    p.run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('project', help='yml or json file of the project')
+    parser.add_argument('--report', help='write the startup times here as JSON')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='always read the project file itself')
+    log.add_arguments(parser)
+    args = parser.parse_args(argv)
+    log.apply_args(args)
+
+    try:
+        run(args.project, args.report, not args.no_cache)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
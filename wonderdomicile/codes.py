@@ -0,0 +1,29 @@
+"""
+Commands controller.ino understands on top of bibliopixel's CMDTYPE, and the
+firmware versions which added them. These must match the firmware.
+"""
+
+# Only the pixels which changed, see delta.py
+PIXEL_DELTA = 8
+
+# PIXEL_DATA and PIXEL_DELTA with a sequence number byte before the payload.
+# The firmware acks them with the return code and the sequence number as
+# soon as the frame is read, before showing it.
+PIXEL_DATA_SEQ = 9
+PIXEL_DELTA_SEQ = 10
+
+# A pattern for the firmware to render itself, see procedural.py
+PROGRAM = 11
+
+# Sequence number byte, uint32 step and uint8 number of steps since the last
+# frame: fade that many times, then render and show the program's frame for
+# that step. Acked like the sequenced frames.
+TICK = 12
+
+DELTA_VERSION = 4
+PIPELINE_VERSION = 5
+
+# Version 6 had a TICK without the number of steps, which isn't used
+PROCEDURAL_VERSION = 7
+
+FIRMWARE_VERSION = PROCEDURAL_VERSION
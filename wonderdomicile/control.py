@@ -0,0 +1,282 @@
+"""
+Live changes to a running sequence over HTTP, turned on with `control` on
+wonderdomicile.sequence.Sequence:
+
+    control:
+      host: 0.0.0.0
+      port: 8787
+
+The server is an asyncio event loop on its own thread. Each request becomes
+a change that the sequence applies between two frames, on its own thread, so
+rendering and the drivers never wait for the network and never see half a
+change. The response is sent once the change has been applied.
+
+Changing an animation's parameters builds a new copy of it on a worker
+thread and gets it ready to run (see wonderdomicile/prewarm.py), so its
+masks, palette tables and frame cache are made there. The copy is then
+swapped in and carries on from the step and frame the old one had got to.
+Changes last until the project is restarted; wonderdomicile.yml is left as
+it is.
+
+    curl localhost:8787/
+    curl -d '{"name": "Fire"}' localhost:8787/animation
+    curl -d '{"brightness": 128}' localhost:8787/brightness
+    curl -d '{"animation": "Chase", "params": {"spacing": 20}}' \\
+        localhost:8787/params
+
+`animation` is the name of the animation in the sequence, the current one if
+it's left out. Parameters are as they would be in the yml, so a palette is
+`{"palette": {"colors": ["red", "blue"]}}`.
+"""
+
+import asyncio, collections, concurrent.futures, http, json, threading
+
+from bibliopixel.util import log
+
+from . import prewarm
+
+HOST = '127.0.0.1'
+PORT = 8787
+
+# Largest request body accepted
+MAX_BODY = 64 * 1024
+
+# Seconds to wait for a request to arrive, and for the sequence to apply a
+# change, which it only does while it is running
+REQUEST_TIMEOUT = 5
+APPLY_TIMEOUT = 5
+
+
+class Error(Exception):
+    """
+    A request that can't be done, with the HTTP status to answer it with.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Controller:
+    """
+    :param sequence: the wonderdomicile.sequence.Sequence to change
+    :param host: address to listen on, 0.0.0.0 for every interface
+    :param port: port to listen on
+    """
+
+    def __init__(self, sequence, host=HOST, port=PORT):
+        self.sequence = sequence
+        self.host = host
+        self.port = port
+
+        # Changes waiting for the next frame, as functions and the futures
+        # of their results. Appending and popping are atomic.
+        self._changes = collections.deque()
+
+        # Builds new copies of animations
+        self._builder = concurrent.futures.ThreadPoolExecutor(1)
+
+        self._loop = None
+        self._thread = None
+
+        self.routes = {
+            ('GET', '/'): self.status,
+            ('POST', '/animation'): self.set_animation,
+            ('POST', '/brightness'): self.set_brightness,
+            ('POST', '/params'): self.set_params,
+        }
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run, name='Control', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        self._thread = None
+        self._builder.shutdown(wait=False)
+        for change, future in self._changes:
+            future.cancel()
+        self._changes.clear()
+
+    def apply(self):
+        """
+        Apply the changes that have come in, called by the sequence between
+        two frames.
+        """
+        while self._changes:
+            change, future = self._changes.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(change())
+            except Exception as e:
+                future.set_exception(e)
+
+    async def on_frame(self, change):
+        """
+        Have the sequence call `change` between two frames.
+
+        :return: what it returns
+        """
+        future = concurrent.futures.Future()
+        self._changes.append((change, future))
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future), APPLY_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise Error(503, 'The sequence is not running')
+
+    async def status(self, data):
+        def status():
+            sequence = self.sequence
+            current = sequence.current_animation
+            return {
+                'animation': current and current.name,
+                'animations': [a.name for a in sequence.animations],
+                'brightness': sequence.layout.brightness,
+            }
+        return await self.on_frame(status)
+
+    async def set_animation(self, data):
+        name = field(data, 'name', str)
+        await self.on_frame(lambda: self.sequence.select(name))
+        return {'animation': name}
+
+    async def set_brightness(self, data):
+        brightness = field(data, 'brightness', int)
+        if not 0 <= brightness <= 255:
+            raise Error(400, 'brightness must be 0 - 255')
+        await self.on_frame(
+            lambda: self.sequence.layout.set_brightness(brightness))
+        return {'brightness': brightness}
+
+    async def set_params(self, data):
+        params = field(data, 'params', dict)
+        name = data.get('animation')
+        animation = await self.on_frame(lambda: self.sequence.find(name))
+
+        copy = await asyncio.wrap_future(
+            self._builder.submit(self._build, animation, params))
+        old = await self.on_frame(lambda: animation.replace(copy, params))
+
+        # Stopping its render worker can take a moment
+        if old is not None:
+            self._builder.submit(old.cleanup, False)
+        log.info('control: %s: changed %s', animation.name,
+                 ', '.join(sorted(params)))
+        return {'animation': animation.name, 'params': params}
+
+    def _build(self, animation, params):
+        try:
+            copy = animation.build(params)
+        except Exception as e:
+            raise Error(400, str(e))
+
+        # Start it from about where the running one is, so that a render
+        # worker doesn't have far to catch up. The old one's frame is still
+        # being drawn on the render thread, so it's copied by replace(),
+        # between frames.
+        old = animation.animation
+        if old is not None and hasattr(copy, 'continue_from'):
+            copy.continue_from(old, frame=False)
+        prewarm.warm(copy)
+        return copy
+
+    def _run(self):
+        loop = self._loop
+        asyncio.set_event_loop(loop)
+        try:
+            server = loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port))
+        except OSError as e:
+            log.error('control: unable to listen on %s:%s: %s',
+                      self.host, self.port, e)
+            loop.close()
+            return
+
+        log.info('control: listening on %s:%s', self.host, self.port)
+        loop.run_forever()
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            method, path, data = await asyncio.wait_for(
+                read_request(reader), REQUEST_TIMEOUT)
+            route = self.routes.get((method, path.split('?')[0]))
+            if not route:
+                raise Error(404, 'No such page')
+            status, result = 200, await route(data)
+
+        except Error as e:
+            status, result = e.status, {'error': str(e)}
+        except KeyError as e:
+            status, result = 404, {'error': str(e.args[0])}
+        except asyncio.TimeoutError:
+            status, result = 408, {'error': 'Timed out'}
+        except Exception as e:
+            log.exception('control: unable to handle a request')
+            status, result = 500, {'error': str(e)}
+
+        body = json.dumps(result).encode()
+        head = 'HTTP/1.0 %d %s\r\n' % (status, http.HTTPStatus(status).phrase)
+        head += 'Content-Type: application/json\r\n'
+        head += 'Content-Length: %d\r\n\r\n' % len(body)
+        try:
+            writer.write(head.encode() + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def read_request(reader):
+    """
+    :return: the method, path and JSON body of an HTTP request
+    """
+    try:
+        line = await reader.readline()
+        method, path, version = line.decode('latin-1').split()
+    except ValueError:
+        raise Error(400, 'Bad request line')
+
+    length = 0
+    while True:
+        header = await reader.readline()
+        if header.strip() == b'':
+            break
+        name, _, value = header.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            try:
+                length = int(value)
+            except ValueError:
+                raise Error(400, 'Bad Content-Length')
+
+    if length > MAX_BODY:
+        raise Error(413, 'Body too long')
+    body = await reader.readexactly(length) if length else b''
+    try:
+        data = json.loads(body.decode()) if body else {}
+    except ValueError:
+        raise Error(400, 'Body is not JSON')
+    if not isinstance(data, dict):
+        raise Error(400, 'Body is not a JSON object')
+    return method.upper(), path, data
+
+
+def field(data, name, kind):
+    """
+    :return: data[name], which has to be a `kind`
+    """
+    value = data.get(name)
+    # JSON true and false are bools, which are ints to isinstance()
+    if not isinstance(value, kind) or (
+            isinstance(value, bool) and kind is not bool):
+        raise Error(400, '%s must be a %s' % (name, kind.__name__))
+    return value
@@ -0,0 +1,117 @@
+"""
+Encoding for the PIXEL_DELTA command, which only sends the pixels that
+changed since the last frame the controller showed.
+
+The payload is a series of spans. Each span starts with two little-endian
+uint16s: the index of its first pixel and its pixel count. If the count has
+RUN_FLAG set, one color follows which fills the whole span; otherwise
+count colors follow. Pixels outside every span keep their colors.
+"""
+
+import struct
+
+import numpy as np
+
+from bibliopixel.drivers.return_codes import RETURN_CODES
+
+# Must match controller.ino
+RUN_FLAG = 0x8000
+SPAN = struct.Struct('<HH')
+
+# Unchanged pixels between two changed ones are sent anyway when that is
+# no bigger than starting a new span
+MAX_GAP = SPAN.size // 3
+
+# Runs of one color shorter than this are cheaper sent as they are
+MIN_RUN = 4
+
+
+def encode(colors, *shown):
+    """
+    :param colors: uint8 array of shape (n, 3) to be shown
+    :param shown: uint8 arrays of shape (n, 3) which could be currently
+        shown. The payload works on any of them.
+    :return: PIXEL_DELTA payload, empty if nothing changed
+    """
+    payload = bytearray()
+    changed = (colors != shown[0]).any(1)
+    for other in shown[1:]:
+        changed |= (colors != other).any(1)
+    changed = np.flatnonzero(changed)
+    if not len(changed):
+        return payload
+
+    breaks = np.flatnonzero(np.diff(changed) > MAX_GAP + 1)
+    starts = changed[np.r_[0, breaks + 1]]
+    ends = changed[np.r_[breaks, len(changed) - 1]] + 1
+
+    # True where a pixel is a different color from the one before it
+    differs = np.ones(len(colors), bool)
+    differs[1:] = (colors[1:] != colors[:-1]).any(1)
+
+    for start, end in zip(starts, ends):
+        bounds = np.r_[start, np.flatnonzero(differs[start + 1:end]) + start + 1, end]
+        lengths = np.diff(bounds)
+        runs = np.flatnonzero(lengths >= MIN_RUN)
+
+        literal = start
+        for r in runs:
+            run_start, run_end = bounds[r], bounds[r + 1]
+            if literal < run_start:
+                _add_literal(payload, colors, literal, run_start)
+            payload += SPAN.pack(run_start, (run_end - run_start) | RUN_FLAG)
+            payload += colors[run_start].tobytes()
+            literal = run_end
+
+        if literal < end:
+            _add_literal(payload, colors, literal, end)
+
+    return payload
+
+
+def smaller(colors, *shown):
+    """
+    :return: the PIXEL_DELTA payload from shown to colors, or None if it
+        isn't smaller than sending all the colors
+    """
+    changes = encode(colors, *shown)
+    if len(changes) < colors.nbytes:
+        return changes
+
+
+def _add_literal(payload, colors, start, end):
+    payload += SPAN.pack(start, end - start)
+    payload += colors[start:end].tobytes()
+
+
+def decode(data, leds):
+    """
+    Apply a PIXEL_DELTA payload the way the firmware does.
+
+    :param data: the payload
+    :param leds: bytearray of 3 bytes per led, changed in place
+    :return: the return code the firmware sends back
+    """
+    size = len(data)
+    num_leds = len(leds) // 3
+    read = 0
+    while read + SPAN.size <= size:
+        start, count = SPAN.unpack_from(data, read)
+        read += SPAN.size
+
+        run = count & RUN_FLAG
+        count &= ~RUN_FLAG
+        length = 3 if run else 3 * count
+
+        if read + length > size or start + count > num_leds:
+            return RETURN_CODES.ERROR_SIZE
+
+        if run:
+            leds[3 * start:3 * (start + count)] = data[read:read + 3] * count
+        else:
+            leds[3 * start:3 * (start + count)] = data[read:read + length]
+        read += length
+
+    if read != size:
+        return RETURN_CODES.ERROR_SIZE
+    return RETURN_CODES.SUCCESS
@@ -0,0 +1,200 @@
+"""
+Stand-in for a Teensy running controller/controller.ino, on a pseudo-terminal.
+
+It answers the same commands the same way as the firmware, including only
+acking PIXEL_DATA after the time LEDS.show() would take and acking the
+sequenced commands before it, so drivers can be tried out and timed without
+the hardware:
+
+    python -m wonderdomicile.fake_teensy
+
+prints two device paths to use as `dev` in a project's drivers.
+"""
+
+import os, struct, threading, time, tty
+
+from bibliopixel.drivers.return_codes import RETURN_CODES
+from bibliopixel.drivers.serial.codes import CMDTYPE
+
+from . import codes, delta, procedural
+
+# Must match the firmware
+NUM_LEDS_PER_STRIP = 143
+NUM_STRIPS = 8
+FIRMWARE_VER = codes.FIRMWARE_VERSION
+
+# OctoWS2811 clocks out 24 bits per led at 800kHz on all strips at once
+SHOW_SECONDS = NUM_LEDS_PER_STRIP * 24 / 800000
+
+
+class FakeTeensy:
+    def __init__(self, device_id=0, show_seconds=SHOW_SECONDS):
+        self.device_id = device_id
+        self.show_seconds = show_seconds
+
+        # Frames are read into frame and copied to leds to be shown
+        self.frame = bytearray(3 * NUM_LEDS_PER_STRIP * NUM_STRIPS)
+        self.leds = bytearray(len(self.frame))
+        self.frame_valid = False
+        self.brightness = 255
+
+        # procedural.Renderer for the last PROGRAM, if it was a good one
+        self.program = None
+        self.frames = 0
+
+        self._master, slave = os.openpty()
+        tty.setraw(slave)
+        self.dev = os.ttyname(slave)
+        self._slave = slave
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        for fd in self._master, self._slave:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _read(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = os.read(self._master, size - len(data))
+            if not chunk:
+                raise EOFError
+            data.extend(chunk)
+        return data
+
+    def _write(self, *codes):
+        os.write(self._master, bytes(codes))
+
+    def _run(self):
+        try:
+            while True:
+                cmd, size = struct.unpack('<BH', self._read(3))
+                self.command(cmd, size)
+        except (EOFError, OSError):
+            pass
+
+    def show(self):
+        self.leds[:] = self.frame
+        time.sleep(self.show_seconds)
+        self.frames += 1
+
+    def read_frame(self, size):
+        data = self._read(size)
+        if size != len(self.frame):
+            return RETURN_CODES.ERROR_SIZE
+        self.frame[:] = data
+        return RETURN_CODES.SUCCESS
+
+    def read_delta(self, size):
+        data = self._read(size)
+        if not self.frame_valid:
+            return RETURN_CODES.ERROR
+        return delta.decode(data, self.frame)
+
+    def command(self, cmd, size):
+        """
+        Handle one command, like getData() in the firmware.
+        """
+        if cmd == CMDTYPE.PIXEL_DATA:
+            data = self._read(size)
+            self.frame[:len(data)] = data[:len(self.frame)]
+            self.frame_valid = True
+            self.show()
+            self._write(RETURN_CODES.SUCCESS)
+
+        elif cmd == codes.PIXEL_DELTA:
+            code = self.read_delta(size)
+            self.frame_valid = code == RETURN_CODES.SUCCESS
+            if self.frame_valid:
+                self.show()
+            self._write(code)
+
+        elif cmd in (codes.PIXEL_DATA_SEQ, codes.PIXEL_DELTA_SEQ):
+            if size < 1:
+                self._write(RETURN_CODES.ERROR_SIZE, 0)
+                return
+            sequence = self._read(1)[0]
+            if cmd == codes.PIXEL_DATA_SEQ:
+                code = self.read_frame(size - 1)
+            else:
+                code = self.read_delta(size - 1)
+            self.frame_valid = code == RETURN_CODES.SUCCESS
+            self._write(code, sequence)
+            if self.frame_valid:
+                self.show()
+
+        elif cmd == codes.PROGRAM:
+            data = self._read(size)
+            try:
+                self.program = procedural.Renderer(data)
+                if len(self.program.colors) * 3 != len(self.frame):
+                    raise ValueError('Program is for the wrong number of leds')
+                if max(self.program.order) > 2:
+                    raise ValueError('Bad channel order')
+                code = RETURN_CODES.SUCCESS
+            except ValueError:
+                self.program = None
+                code = RETURN_CODES.ERROR_SIZE
+            self._write(code)
+
+        elif cmd == codes.TICK:
+            data = self._read(size)
+            if size != 1 + procedural.TICK.size:
+                self._write(RETURN_CODES.ERROR_SIZE, 0)
+            elif not self.program:
+                self._write(RETURN_CODES.ERROR, data[0])
+            else:
+                step, steps = procedural.TICK.unpack_from(data, 1)
+                self._write(RETURN_CODES.SUCCESS, data[0])
+                self.frame[:] = self.program.tick(step, steps)
+                self.frame_valid = True
+                self.show()
+
+        elif cmd == CMDTYPE.GETID:
+            self._write(self.device_id)
+
+        elif cmd == CMDTYPE.SETID:
+            if size != 1:
+                self._write(RETURN_CODES.ERROR_SIZE)
+            else:
+                self.device_id = self._read(1)[0]
+                self._write(RETURN_CODES.SUCCESS)
+
+        elif cmd == CMDTYPE.SETUP_DATA:
+            if size != 4:
+                self._write(RETURN_CODES.ERROR_SIZE)
+            else:
+                ledtype, pixel_count, spi_speed = struct.unpack(
+                    '<BHB', self._read(size))
+                if pixel_count // 3 != NUM_LEDS_PER_STRIP * NUM_STRIPS:
+                    self._write(RETURN_CODES.ERROR_PIXEL_COUNT)
+                else:
+                    self._write(RETURN_CODES.SUCCESS)
+
+        elif cmd == CMDTYPE.BRIGHTNESS:
+            if size != 1:
+                self._write(RETURN_CODES.ERROR_SIZE)
+            else:
+                self.brightness = self._read(1)[0]
+                self._write(RETURN_CODES.SUCCESS)
+
+        elif cmd == CMDTYPE.GETVER:
+            self._write(RETURN_CODES.SUCCESS, FIRMWARE_VER)
+
+        else:
+            self._write(RETURN_CODES.ERROR_BAD_CMD)
+
+
+if __name__ == '__main__':
+    teensys = [FakeTeensy(i) for i in range(2)]
+    for t in teensys:
+        print('device_id %d: %s' % (t.device_id, t.dev))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,89 @@
+"""
+Where every pixel of the sculpture physically is, as arrays indexed [x, y]
+like a FrameMatrix's frame, so animations can work with columns, sides,
+angles and heights instead of working them out from x with magic numbers.
+
+Each of the columns has sides, each side has strips and each strip has leds,
+as in mapping.make_index: x counts strips column by column and side by side,
+and y counts leds from the bottom.
+"""
+
+import math
+
+import numpy as np
+
+
+class Geometry:
+    """
+    Same description as :py:class:`wonderdomicile.layout.Sculpture`.
+
+    Every array is shape (width, height), but only stores one row or column
+    of numbers, broadcast over the other axis, so they cost next to nothing
+    and can't be written to.
+    """
+
+    def __init__(self, columns=2, sides=4, strips=2, leds=143):
+        self.columns = columns
+        self.sides = sides
+        self.strips = strips
+        self.leds = leds
+
+        # Same as the layout's (width, height)
+        self.shape = columns * sides * strips, leds
+
+        x = np.arange(self.shape[0])
+        column, rest = np.divmod(x, sides * strips)
+        side, strip = np.divmod(rest, strips)
+
+        # Which column each pixel is on, 0 to columns - 1
+        self.column = self._per_x(column)
+
+        # Which side of its column, 0 to sides - 1, going around the same
+        # way as the strips
+        self.side = self._per_x(side)
+
+        # Which strip of its side, 0 to strips - 1
+        self.strip = self._per_x(strip)
+
+        # Every side of every column counted together
+        self.face = self._per_x(column * sides + side)
+
+        # Angle around the column in radians, from 0 to 2 pi, with the
+        # strips of each side spread evenly over its share of the circle
+        self.angle = self._per_x(
+            2 * math.pi * (side + (strip + 0.5) / strips) / sides)
+
+        # Height from 0 at the bottom led to 1 at the top one
+        self.height = self._per_y(
+            np.arange(leds) / max(1, leds - 1))
+
+        # Led number from the bottom
+        self.led = self._per_y(np.arange(leds))
+
+    def _per_x(self, values):
+        return np.broadcast_to(np.asarray(values)[:, None], self.shape)
+
+    def _per_y(self, values):
+        return np.broadcast_to(np.asarray(values)[None, :], self.shape)
+
+    def turns(self):
+        """
+        :return: the angle as a fraction of the way around, 0 - 1
+        """
+        return self.angle / (2 * math.pi)
+
+
+def for_layout(layout):
+    """
+    :return: the layout's Geometry, or a best guess for layouts that aren't
+        a Sculpture: four sides of two strips per column if the width
+        allows, otherwise a single side with every x as a strip
+    """
+    geometry = getattr(layout, 'geometry', None)
+    if geometry is not None:
+        return geometry
+
+    width, height = layout.width, layout.height
+    if width % 8 == 0:
+        return Geometry(width // 8, 4, 2, height)
+    return Geometry(1, 1, width, height)
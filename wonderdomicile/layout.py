@@ -0,0 +1,52 @@
+import time
+
+from bibliopixel.layout.matrix import Matrix
+
+from . import geometry, mapping
+
+
+class Sculpture(Matrix):
+    """
+    Matrix layout for the sculpture, with the coord_map generated from its
+    physical description instead of listed in the project.
+    """
+    CLONE_ATTRS = Matrix.CLONE_ATTRS + ('columns', 'sides', 'strips', 'leds')
+
+    def __init__(self, drivers, columns=2, sides=4, strips=2, leds=143,
+                 serpentine=False, **kwds):
+        # These all follow from the description. clone() passes them back in.
+        for k in 'width', 'height', 'coord_map':
+            kwds.pop(k, None)
+
+        self.columns = columns
+        self.sides = sides
+        self.strips = strips
+        self.leds = leds
+
+        # Strip position of every [x, y], and the frame position of every
+        # strip position, see mapping.inverse
+        self.pixel_index = mapping.load_index(
+            columns=columns, sides=sides, strips=strips, leds=leds,
+            serpentine=serpentine)
+        self.frame_index = mapping.inverse(self.pixel_index)
+
+        # Fixed by the geometry, so drivers that take the whole frame, like
+        # the recorder, can be added without making the layout bigger
+        self.numLEDs = self.pixel_index.size
+
+        width, height = self.pixel_index.shape
+        super().__init__(
+            drivers, width=width, height=height, serpentine=serpentine,
+            coord_map=mapping.to_coord_map(self.pixel_index), **kwds)
+
+        # Where each pixel physically is
+        self.geometry = geometry.Geometry(columns, sides, strips, leds)
+
+        # Seconds the last push_to_driver() took, see
+        # wonderdomicile.scheduler
+        self.update_time = 0
+
+    def push_to_driver(self):
+        start = time.time()
+        super().push_to_driver()
+        self.update_time = time.time() - start
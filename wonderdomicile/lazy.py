@@ -0,0 +1,181 @@
+"""
+Stand-in for an animation in a sequence, which only imports and builds the
+animation the first time the sequence gets to it. A sequence with `lazy:
+true` wraps all its animations in these, so starting a project doesn't wait
+for every animation module, BiblioPixelAnimations and things like worker
+processes to load.
+
+It can also build a copy of the animation with different parameters and
+swap it in while it runs, see wonderdomicile/control.py.
+"""
+
+import copy, os, threading, time
+
+from bibliopixel.animation import failed, runner
+from bibliopixel.animation.animation import Animation
+from bibliopixel.project import load, recurse
+from bibliopixel.util import exception, log
+
+TYPENAME = 'wonderdomicile.lazy.Lazy'
+
+
+def wrap(desc):
+    """
+    :return: the description of a Lazy for an animation's description
+    """
+    desc = load.load_if_filename(desc) or desc
+    if isinstance(desc, str):
+        desc = {'typename': desc}
+    desc = dict(desc)
+
+    typename = desc.get('typename', '')
+    name = desc.get('name') or typename.split('.')[-1]
+    return {'typename': TYPENAME, 'name': name,
+            'run': desc.pop('run', {}), 'animation': desc}
+
+
+class Lazy(Animation):
+    """
+    :param dict animation: the description of the animation, as it would be
+        in the project
+    """
+
+    def __init__(self, layout, *, animation, **kwds):
+        super().__init__(layout, **kwds)
+        self.desc = animation
+        self.animation = None
+        self.project = None
+
+        # Seconds it took to import and build the animation
+        self.load_time = None
+
+        self._run = {}
+        self._firmware_ok = True
+
+        # Held while loading, which can happen on a prewarm thread, see
+        # wonderdomicile/prewarm.py
+        self._lock = threading.Lock()
+
+    def _set_runner(self, run):
+        super()._set_runner(run)
+        self._run = dict(run or {})
+
+    def set_project(self, project):
+        super().set_project(project)
+        self.project = project
+
+    @property
+    def title(self):
+        if self.animation:
+            return self.animation.title
+        return self.desc.get('typename', 'Lazy').split('.')[-1]
+
+    @property
+    def firmware_ok(self):
+        return self._firmware_ok
+
+    @firmware_ok.setter
+    def firmware_ok(self, ok):
+        # Passed on to animations which draw on the Teensys, see
+        # animations/frame.py
+        self._firmware_ok = ok
+        if hasattr(self.animation, 'firmware_ok'):
+            self.animation.firmware_ok = ok
+
+    def load(self):
+        """
+        Import and build the animation if that hasn't been done yet.
+
+        :return: the animation
+        """
+        with self._lock:
+            if self.animation is None:
+                start = time.time()
+                animation = self._construct()
+                animation.top_level = False
+                self.animation = animation
+                self.firmware_ok = self._firmware_ok
+                self.load_time = time.time() - start
+                log.info('%s: loaded in %.3fs', self.name, self.load_time)
+        return self.animation
+
+    def build(self, params):
+        """
+        Build a new copy of the animation with some parameters changed,
+        without touching the one that's running.
+
+        :param dict params: the parameters to change, as they would be in
+            the project
+        :return: the new animation
+        """
+        animation = self._construct(dict(self.desc, **params))
+        if isinstance(animation, failed.Failed):
+            raise animation.exception
+        animation.top_level = False
+        return animation
+
+    def replace(self, animation, params):
+        """
+        Swap in an animation made by build(), between two frames. If the
+        old one is running, the new one carries on from where it was.
+
+        :return: the old animation, if it was loaded, for the caller to
+            clean up
+        """
+        with self._lock:
+            self.desc = dict(self.desc, **params)
+            old, self.animation = self.animation, animation
+            self.firmware_ok = self._firmware_ok
+
+        if old is not None and self.state == runner.STATE.running:
+            animation.pre_run()
+            continue_from = getattr(animation, 'continue_from', None)
+            if continue_from:
+                continue_from(old)
+        return old
+
+    def _construct(self, desc=None):
+        desc = copy.deepcopy(self.desc if desc is None else desc)
+        desc['run'] = dict(self._run)
+
+        # Like bibliopixel.project.project.project()
+        path = self.project.path
+        if load.ROOT_FILE:
+            root = os.path.dirname(load.ROOT_FILE)
+            path = path + ':' + root if path else root
+
+        def post(desc):
+            exc = desc.get('_exception')
+            if exc:
+                raise exc
+            return self.project.construct_child('animation', **desc)
+
+        python_path = 'bibliopixel.animation'
+        with exception.add('Unable to create ' + self.name):
+            with load.extender(path):
+                desc = recurse.recurse(desc, python_path=python_path)
+                animation = recurse.recurse(
+                    desc, pre=None, post=post, python_path=python_path)
+
+        animation.set_project(self.project)
+        return animation
+
+    def _pre_run(self):
+        # Here rather than in pre_run(), which a sequence calls on all its
+        # animations when it starts
+        self.load()
+        super()._pre_run()
+
+    def pre_run(self):
+        if self.animation:
+            self.animation._pre_run()
+
+    def step(self, amt=1):
+        self.animation.step(amt)
+        if self.animation.completed:
+            self.completed = True
+
+    def cleanup(self, clean_layout=True):
+        if self.animation:
+            self.animation.cleanup(False)
+        super().cleanup(clean_layout)
@@ -0,0 +1,70 @@
+"""
+Generate the mapping from (x, y) on the sculpture to the position of that
+pixel in the LED strips, instead of writing coord_maps out by hand.
+"""
+
+import os
+
+import numpy as np
+
+CACHE_DIR = os.path.expanduser('~/.cache/wonderdomicile')
+
+
+def make_index(columns=2, sides=4, strips=2, leds=143, serpentine=False):
+    """
+    Each of the columns has sides, each side has strips and each strip has
+    leds. Strips are wired one after the other, bottom to top, so x picks
+    the strip and y the led along it.
+
+    :param serpentine: if True, every other strip is wired top to bottom
+    :return: int array of shape (width, height) with the strip position of
+        every [x, y], width = columns * sides * strips and height = leds
+    """
+    width = columns * sides * strips
+    y = np.arange(leds)
+    index = np.empty((width, leds), np.intp)
+    for x in range(width):
+        if serpentine and x % 2:
+            index[x] = x * leds + leds - 1 - y
+        else:
+            index[x] = x * leds + y
+    return index
+
+
+def load_index(**desc):
+    """
+    Same as make_index, but cached on disk.
+    """
+    name = '-'.join('%s=%s' % kv for kv in sorted(desc.items()))
+    filename = os.path.join(CACHE_DIR, 'index-%s.npy' % name)
+    try:
+        return np.load(filename)
+    except (OSError, ValueError):
+        pass
+
+    index = make_index(**desc)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        np.save(filename, index)
+    except OSError:
+        pass
+    return index
+
+
+def to_coord_map(index):
+    """
+    :return: index as a BiblioPixel coord_map, indexed [y][x]
+    """
+    return index.T.tolist()
+
+
+def inverse(index):
+    """
+    :return: flat array giving, for every strip position, the position of
+        that pixel in a flattened (width, height) frame. Gathering a
+        flattened frame through it puts the pixels in strip order.
+    """
+    flat = index.ravel()
+    result = np.zeros(flat.max() + 1, np.intp)
+    result[flat] = np.arange(len(flat))
+    return result
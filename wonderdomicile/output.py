@@ -0,0 +1,81 @@
+"""
+The last stage of the Teensy driver: turning the layout's colors into the
+bytes the device shows.
+
+Brightness, gamma and channel order are compiled into a single 256 entry
+table, so a whole device's worth of pixels is corrected and reordered with
+one numpy lookup, written straight into the frame buffer that goes out on
+the serial port. Gamma correction and dimming on the host then cost the same
+as neither.
+"""
+
+import itertools
+
+import numpy as np
+
+
+def make_table(gamma, brightness=255):
+    """
+    :param gamma: a bibliopixel Gamma
+    :param brightness: 0 - 255
+    :return: uint8 array of what each byte value is sent as. Like
+        bibliopixel's drivers, brightness scales before gamma.
+    """
+    values = np.arange(256) * (brightness / 255)
+    return gamma.np_table[values.astype(np.intp)]
+
+
+def to_array(colors):
+    """
+    :return: uint8 array of shape (n, 3) of a list of colors, clamped to
+        0 - 255
+    """
+    if isinstance(colors, np.ndarray):
+        colors = colors.reshape(-1, 3)
+        if colors.dtype == np.uint8:
+            return colors
+        return np.clip(colors, 0, 255).astype(np.uint8)
+
+    try:
+        flat = itertools.chain.from_iterable(colors)
+        return np.fromiter(flat, np.uint8, 3 * len(colors)).reshape(-1, 3)
+    except (OverflowError, ValueError):
+        # Some animations go past the ends, which the drivers clamp
+        return np.clip(np.array(colors, float), 0, 255).astype(np.uint8)
+
+
+class Output:
+    """
+    :param gamma: the driver's bibliopixel Gamma
+    :param c_order: the driver's channel order, like (1, 0, 2) for GRB
+    :param brightness: 0 - 255
+    """
+
+    def __init__(self, gamma, c_order, brightness=255):
+        self.gamma = gamma
+        self.order = list(c_order)
+        self.brightness = None
+        self.table = None
+        self.set_brightness(brightness)
+
+    def set_brightness(self, brightness):
+        """
+        Rebuild the table for a new brightness. It's replaced, not changed,
+        so a thread using the old one isn't affected.
+        """
+        if brightness != self.brightness:
+            self.brightness = brightness
+            self.table = make_table(self.gamma, brightness)
+
+    def render(self, colors, out):
+        """
+        :param colors: the colors of the device's pixels from the layout's
+            color_list, as a list of colors or an array
+        :param out: writable buffer for the bytes, at least three per pixel
+        :return: the number of bytes written
+        """
+        colors = to_array(colors)
+        size = colors.size
+        buf = np.frombuffer(out, np.uint8, size).reshape(-1, 3)
+        np.take(self.table, colors[:, self.order], out=buf)
+        return size
@@ -0,0 +1,99 @@
+"""
+Getting the next animation of a sequence ready on a background thread while
+the current one is running, turned on with `prewarm: true` on
+wonderdomicile.sequence.Sequence.
+
+As soon as an animation starts, the one after it is built if it's lazy (see
+wonderdomicile/lazy.py), which is where modules are imported, palettes are
+made and processes are started. Then animations with a prewarm() method,
+like animations/frame.FrameMatrix, build their tables, load their frame
+caches, and start their render workers or render a throwaway step so that
+whatever the first frame makes has already been made. Everything the step
+moved on is put back afterwards. Switching to it is then no slower than any
+other frame.
+
+The sequence logs how long the first frame of each animation took, and adds
+it to the telemetry as `switch`.
+"""
+
+import threading, time
+
+from bibliopixel.util import log
+
+from . import lazy
+
+def warm(animation):
+    """
+    Build the animation if it's lazy, and have it get ready to run.
+    """
+    if isinstance(animation, lazy.Lazy):
+        animation = animation.load()
+    prewarm = getattr(animation, 'prewarm', None)
+    if prewarm:
+        prewarm()
+
+
+class Prewarmer:
+    """
+    Warms animations up on a background thread, one after the other.
+    """
+
+    def __init__(self):
+        # The threads warming animations up or done with them, by the
+        # animation, and the animation last started on
+        self._threads = {}
+        self._last = None
+
+        # Animations that have been warmed up and haven't started yet
+        self._warm = set()
+
+    def start(self, animation):
+        """
+        Start warming `animation` up, unless it's the last one that was.
+        It mustn't be running.
+        """
+        if animation is None or animation is self._last:
+            return
+        # After the one before, so two threads never get the same animation
+        # ready
+        previous = self._threads.get(self._last)
+        self._last = animation
+        thread = self._threads[animation] = threading.Thread(
+            target=self._run, args=(animation, previous), name='Prewarm',
+            daemon=True)
+        thread.start()
+
+    def ready(self, animation):
+        """
+        :return: False if the animation is still being warmed up
+        """
+        thread = self._threads.get(animation)
+        return not (thread and thread.is_alive())
+
+    def wait(self, animation):
+        """
+        Wait until warming the animation up is done, before it starts
+        running.
+
+        :return: True if it was warmed up before it was needed
+        """
+        thread = self._threads.pop(animation, None)
+        if thread is None:
+            return False
+        ready = not thread.is_alive()
+        thread.join()
+        warmed = animation in self._warm
+        self._warm.discard(animation)
+        return ready and warmed
+
+    def _run(self, animation, previous):
+        if previous:
+            previous.join()
+        start = time.time()
+        try:
+            warm(animation)
+        except Exception:
+            log.exception('%s: unable to prewarm', animation.name)
+            return
+        self._warm.add(animation)
+        log.info('%s: prewarmed in %.3fs', animation.name, time.time() - start)
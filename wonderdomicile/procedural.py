@@ -0,0 +1,187 @@
+"""
+Patterns simple enough for the Teensys to render themselves. The host
+uploads a Program once with PROGRAM, then only sends the step number of each
+frame with TICK, see controller.ino, and how many steps it is since the last
+one when frames are skipped.
+
+Every frame, for each of its leds, the firmware does
+
+    color = decay[color], once for each step since the last frame
+    if not masked or mask[group][(phase + step * mask_speed) % period]:
+        color = table[(base + step * speed) % len(table)]
+    output[k] = gamma[color[order[k]]]
+
+which is how chase.Chase, chase.ChaseUp, colorwave.Vertical and
+streaker.MicroSeizure draw a frame: fade, then paint the lit pixels from the
+palette. Renderer below does exactly the same with numpy, as the reference
+for the firmware and for fake_teensy.
+"""
+
+import struct
+
+import numpy as np
+
+# Must match the firmware
+MAX_PERIOD = 1024
+MAX_GROUPS = 4
+MAX_TABLE = 1024
+
+# period (0 for no mask), groups, table size, mask speed, channel order and
+# number of leds
+HEADER = struct.Struct('<HBHH3BH')
+
+# Per led: phase, base and speed as uint16, group as uint8, then its color
+LED = np.dtype([('phase', '<u2'), ('base', '<u2'), ('speed', '<u2'),
+                ('group', 'u1'), ('color', 'u1', (3,))])
+
+# Step and number of steps since the last frame
+TICK = struct.Struct('<IB')
+
+IDENTITY = np.arange(256, dtype=np.uint8)
+
+
+class Program:
+    """
+    A pattern for the firmware, with an entry for every pixel of the layout
+    in color_list order.
+
+    :param table: uint8 array of colors, shape (n, 3)
+    :param base: each pixel's index into `table` at step 0
+    :param speed: how far each pixel moves through `table` every step
+    :param decay: uint8 array of what each byte value fades to every step,
+        None leaves colors as they are
+    :param mask: bool array with the lit phases of each group, shape
+        (groups, period). None lights every pixel every step.
+    :param phase: each pixel's phase
+    :param group: each pixel's row of `mask`
+    :param mask_speed: how many phases the mask moves every step
+    """
+
+    def __init__(self, table, base, speed, decay=None, mask=None,
+                 phase=0, group=0, mask_speed=1):
+        self.table = np.asarray(table, np.uint8).reshape(-1, 3)
+        size = len(self.table)
+        self.base = np.mod(base, size).astype(np.uint16)
+        self.speed = np.broadcast_to(
+            np.mod(speed, size), self.base.shape).astype(np.uint16)
+        self.decay = IDENTITY if decay is None else np.asarray(decay, np.uint8)
+
+        if mask is None:
+            self.mask = np.zeros((0, 0), bool)
+            self.period = 0
+            self.mask_speed = 0
+        else:
+            self.mask = np.asarray(mask, bool)
+            self.period = self.mask.shape[1]
+            self.mask_speed = mask_speed % self.period
+        self.phase = np.broadcast_to(
+            np.mod(phase, self.period or 1), self.base.shape).astype(np.uint16)
+        self.group = np.broadcast_to(group, self.base.shape).astype(np.uint8)
+
+        if not 0 < size <= MAX_TABLE:
+            raise ValueError('Palette table of %d colors' % size)
+        if self.period > MAX_PERIOD or len(self.mask) > MAX_GROUPS:
+            raise ValueError('Mask of %d groups of %d phases' % (
+                len(self.mask), self.period))
+
+    def encode(self, colors, pos, num, table, c_order):
+        """
+        :param colors: uint8 colors of the whole layout to start from, shape
+            (n, 3), before gamma and channel order
+        :param pos: the device's first pixel in the layout
+        :param num: the device's number of pixels
+        :param table: the driver's output table, with its brightness and
+            gamma, see wonderdomicile.output
+        :param c_order: the driver's channel order, like (1, 0, 2) for GRB
+        :return: the PROGRAM payload for one device
+        """
+        end = pos + num
+        leds = np.zeros(num, LED)
+        leds['phase'] = self.phase[pos:end]
+        leds['base'] = self.base[pos:end]
+        leds['speed'] = self.speed[pos:end]
+        leds['group'] = self.group[pos:end]
+        leds['color'] = colors[pos:end]
+
+        header = HEADER.pack(self.period, len(self.mask), len(self.table),
+                             self.mask_speed, *c_order, num)
+
+        return b''.join((
+            header, self.mask.astype(np.uint8).tobytes(),
+            self.table.tobytes(), self.decay.tobytes(),
+            np.asarray(table, np.uint8).tobytes(), leds.tobytes()))
+
+
+def set_table(payload, table):
+    """
+    :return: a PROGRAM payload with a different output table, for when the
+        brightness changes
+    """
+    period, groups, size = HEADER.unpack_from(payload)[:3]
+    start = HEADER.size + groups * period + 3 * size + 256
+    return b''.join((payload[:start], np.asarray(table, np.uint8).tobytes(),
+                     payload[start + 256:]))
+
+
+class Renderer:
+    """
+    The firmware's side: what a device shows after each TICK.
+
+    :param payload: a PROGRAM payload from Program.encode
+    :raises ValueError: if the payload isn't a whole program
+    """
+
+    def __init__(self, payload):
+        if len(payload) < HEADER.size:
+            raise ValueError('Program is too short')
+        (self.period, groups, size, self.mask_speed, c0, c1, c2,
+         num) = HEADER.unpack_from(payload)
+        self.order = [c0, c1, c2]
+        if (self.period > MAX_PERIOD or groups > MAX_GROUPS or
+                not 0 < size <= MAX_TABLE):
+            raise ValueError('Program is too big')
+
+        dtype = np.dtype([
+            ('mask', 'u1', (groups * self.period,)),
+            ('table', 'u1', (size, 3)),
+            ('decay', 'u1', (256,)),
+            ('gamma', 'u1', (256,)),
+            ('leds', LED, (num,))])
+        if len(payload) != HEADER.size + dtype.itemsize:
+            raise ValueError('Program is the wrong size')
+
+        program = np.frombuffer(payload, dtype, 1, HEADER.size)[0]
+        self.mask = program['mask'].astype(bool)
+        self.table = program['table']
+        self.decay = program['decay']
+        self.gamma = program['gamma']
+        leds = program['leds']
+        self.phase = leds['phase'].astype(np.uint32)
+        self.base = leds['base'].astype(np.uint32)
+        self.speed = leds['speed'].astype(np.uint32)
+        self.group = leds['group'].astype(np.uint32)
+        self.colors = leds['color'].copy()
+
+    def tick(self, step, steps=1):
+        """
+        Fade, then paint the lit leds for this step.
+
+        :param steps: steps since the last frame, to fade by
+        :return: the bytes the device shows, in its channel order
+        """
+        for i in range(steps):
+            self.colors = self.decay[self.colors]
+
+        step %= 2 ** 32
+        if self.period:
+            offset = (step % self.period) * self.mask_speed % self.period
+            lit = self.mask[self.group * self.period +
+                            (self.phase + offset) % self.period]
+        else:
+            lit = slice(None)
+
+        size = len(self.table)
+        index = (self.base + (step % size) * self.speed) % size
+        self.colors[lit] = self.table[index[lit]]
+
+        return self.gamma[self.colors[:, self.order]].tobytes()
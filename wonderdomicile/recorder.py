@@ -0,0 +1,147 @@
+"""
+Record every frame the layout sends to its drivers to a file, to play back
+later with animations/playback.py.
+
+A recording is a 16 byte header followed by one fixed size record per frame:
+the frame's time as a float64 and then 3 bytes for every pixel of the layout,
+in color_list order, before brightness and gamma. Fixed size records mean a
+recording can be memory mapped as one numpy array, see load().
+
+Recording again to the same file appends to it. A partial frame at the end,
+left by a crash while it was being written, is cut off first.
+"""
+
+import os, queue, struct, threading, time
+
+import numpy as np
+
+from bibliopixel.drivers.driver_base import DriverBase
+from bibliopixel.util import log
+
+MAGIC = b'WDREC\x00\x00\x01'
+HEADER = struct.Struct('<8sII')
+
+# Frames that can be waiting to be written before new ones get dropped
+BUFFERS = 64
+
+
+def record_dtype(num):
+    return np.dtype([('time', '<f8'), ('colors', 'u1', (num, 3))])
+
+
+def load(path):
+    """
+    :return: numpy record array of the frames in a recording, memory mapped
+    """
+    with open(path, 'rb') as fp:
+        magic, num, _ = HEADER.unpack(fp.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError('%s is not a recording' % path)
+
+    dtype = record_dtype(num)
+    count = (os.path.getsize(path) - HEADER.size) // dtype.itemsize
+    return np.memmap(path, dtype, 'r', HEADER.size, (count,))
+
+
+class Recorder(DriverBase):
+    """
+    Driver that records the whole layout, whatever other drivers it has.
+    Frames are copied into a ring of buffers on the render thread and
+    written out on a thread of their own, so a slow disk drops frames
+    instead of holding up the drivers.
+
+    :param str path: file to append to, created if it doesn't exist
+    :param int num: number of pixels in the layout
+    """
+
+    def __init__(self, path, num=2288, **kwds):
+        super().__init__(num=num, **kwds)
+        self.path = path
+        self.dtype = record_dtype(num)
+
+        self._free = queue.Queue()
+        for i in range(BUFFERS):
+            self._free.put(np.zeros((), self.dtype))
+        self._ready = queue.Queue()
+
+        self.frames = 0
+        self.dropped = 0
+        self._writer = None
+
+    def set_colors(self, colors, pos):
+        # Every pixel of the layout, not just the ones after the drivers
+        # before this one
+        self._colors = colors
+        self._pos = 0
+
+    def start(self):
+        self._file = self._open()
+        self._writer = threading.Thread(
+            target=self._write_frames, name='Recorder %s' % self.path,
+            daemon=True)
+        self._writer.start()
+
+    def stop(self):
+        if self._writer:
+            self._ready.put(None)
+
+    def join(self, timeout=None):
+        if self._writer:
+            self._writer.join(timeout)
+            self._writer = None
+
+    def cleanup(self):
+        self.stop()
+        self.join()
+        log.info('%s: recorded %d frames, dropped %d',
+                 self.path, self.frames, self.dropped)
+
+    def _open(self):
+        """
+        Open the file to append frames to, ending with a whole frame.
+        """
+        fp = open(self.path, 'ab')
+        size = fp.tell()
+        if size < HEADER.size:
+            fp.truncate(0)
+            fp.write(HEADER.pack(MAGIC, self.numLEDs, 0))
+            return fp
+
+        try:
+            frames = load(self.path)
+        except ValueError:
+            fp.close()
+            raise
+        if frames.dtype != self.dtype:
+            fp.close()
+            raise ValueError('%s has a different number of pixels' % self.path)
+
+        whole = HEADER.size + len(frames) * self.dtype.itemsize
+        if size != whole:
+            log.warning('%s: cutting off %d bytes of a partial frame',
+                        self.path, size - whole)
+            fp.truncate(whole)
+        return fp
+
+    def update_colors(self):
+        if not self._writer:
+            return
+        try:
+            record = self._free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return
+
+        record['time'] = time.time()
+        record['colors'] = self._colors[:self.numLEDs]
+        self._ready.put(record)
+
+    def _write_frames(self):
+        with self._file:
+            while True:
+                record = self._ready.get()
+                if record is None:
+                    break
+                self._file.write(record.tobytes())
+                self.frames += 1
+                self._free.put(record)
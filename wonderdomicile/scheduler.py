@@ -0,0 +1,189 @@
+"""
+Adaptive frame scheduling for the animations in a sequence, turned on with
+`adaptive: true` on wonderdomicile.sequence.Sequence.
+
+Without it, an animation moves one step per frame, so when frames take longer
+than 1 / fps its motion slows down and stutters. With it, each frame steps the
+animation by the number of its frame intervals that have actually passed, as
+`amt`, so it keeps its speed and a late frame skips steps to catch up.
+
+The scheduler also keeps an average of how long each animation's frames take,
+step and driver update together. When that doesn't fit in the frame interval,
+the animation is only drawn every second interval (then every third, up to
+MAX_DIVISOR) and steps by two (three, ...) each frame. When its frames fit in
+the faster interval again with room to spare, it goes back up. Rates are
+whole divisors of the animation's fps so that its steps stay whole numbers,
+which frame caches, phase masks and the firmware rely on.
+"""
+
+from bibliopixel.util import log
+
+# Fraction of the frame interval that frames can take on average
+HEADROOM = 0.9
+
+# Frames must take less than this fraction of the next faster interval to
+# go back up to it
+RECOVER = 0.6
+
+# Weight of each frame in the average frame time
+SMOOTHING = 0.05
+
+# Frames to wait after a rate changes before it can change again
+SETTLE = 30
+
+# The slowest rate, as a divisor of the animation's fps
+MAX_DIVISOR = 4
+
+# Most intervals caught up in one frame. Longer stalls, like an animation
+# loading, are forgotten instead of jumping ahead.
+MAX_STEPS = 8
+
+# Least debt carried over, in intervals. Every frame steps at least once,
+# so early frames would otherwise go further and further ahead, and take
+# the steps of any late frames after them.
+MIN_DEBT = -0.5
+
+
+class Rate:
+    """
+    How one animation is being scheduled.
+
+    :param interval: the animation's frame interval at its own fps
+    :param amt: the animation's own step size
+    """
+
+    def __init__(self, interval, amt=1):
+        self.interval = interval
+        self.amt = amt
+
+        # A frame is drawn every `divisor` intervals
+        self.divisor = 1
+
+        # Average seconds a frame takes, None until one has been measured
+        self.cost = None
+
+        # Intervals that have passed but haven't been stepped yet, and when
+        # they were last counted
+        self.debt = 0
+        self.last = None
+
+        self.settle = SETTLE
+
+    @property
+    def sleep_time(self):
+        return self.interval * self.divisor
+
+    @property
+    def fps(self):
+        return 1 / self.sleep_time
+
+    def restart(self):
+        """
+        Start counting intervals again, when the animation starts running.
+        """
+        self.last = None
+
+    def steps(self, now):
+        """
+        :return: how many intervals the frame at time `now` steps by
+        """
+        if self.last is None:
+            self.debt = 1
+        else:
+            self.debt += (now - self.last) / self.interval
+        self.last = now
+
+        steps = max(1, int(self.debt + 0.5))
+        if steps > MAX_STEPS:
+            steps = self.debt = MAX_STEPS
+        self.debt = max(self.debt - steps, MIN_DEBT)
+        return steps
+
+    def add_cost(self, seconds):
+        """
+        Count how long a frame took, and pick a new rate if needed.
+
+        :return: True if the rate changed
+        """
+        if self.cost is None:
+            self.cost = seconds
+        else:
+            self.cost += SMOOTHING * (seconds - self.cost)
+
+        if self.settle:
+            self.settle -= 1
+            return False
+
+        if self.cost > HEADROOM * self.sleep_time:
+            if self.divisor >= MAX_DIVISOR:
+                return False
+            self.divisor += 1
+        elif (self.divisor > 1 and
+              self.cost < RECOVER * self.interval * (self.divisor - 1)):
+            self.divisor -= 1
+        else:
+            return False
+
+        self.settle = SETTLE
+        return True
+
+
+class Scheduler:
+    """
+    Rates for the animations of a sequence, see the module docstring.
+    """
+
+    def __init__(self):
+        # Rate of each animation, by the animation
+        self.rates = {}
+
+    def rate(self, animation):
+        rate = self.rates.get(animation)
+        if rate is None:
+            run = animation.runner
+            rate = self.rates[animation] = Rate(run.sleep_time, run.amt)
+        return rate
+
+    def start(self, animation):
+        """
+        Called when an animation starts running.
+        """
+        self.rate(animation).restart()
+
+    def schedule(self, animation, now):
+        """
+        Set the animation's amt for its frame at time `now`.
+
+        :return: how many intervals it steps by
+        """
+        rate = self.rate(animation)
+        steps = rate.steps(now)
+        animation.runner.amt = rate.amt * steps
+        return steps
+
+    def finish(self, animation, cost):
+        """
+        Called after the animation drew a frame that took `cost` seconds,
+        which sets how long the sequence waits before the next one.
+
+        :return: the animation's fps if it changed, or None
+        """
+        rate = self.rate(animation)
+        changed = rate.add_cost(cost)
+        animation.sleep_time = rate.sleep_time
+        if changed:
+            log.info('%s: drawing at %.1f fps, frames take %.1fms',
+                     animation.name or animation.title, rate.fps,
+                     1000 * rate.cost)
+            return rate.fps
+
+    def summary(self):
+        """
+        :return: dict of the fps and average frame time in milliseconds of
+            each animation that has run, by name
+        """
+        return {
+            str(a.name or a.title): {
+                'fps': rate.fps,
+                'cost': rate.cost and 1000 * rate.cost}
+            for a, rate in self.rates.items()}
@@ -0,0 +1,319 @@
+"""
+bibliopixel's Sequence, recording frame timing for each animation in it and
+how long each one's first frame took, and optionally crossfading from each
+animation into the next, scheduling frames by the clock and getting the next
+animation ready in the background, and taking changes from a control
+server.
+"""
+
+import time
+
+from bibliopixel.animation import runner, sequence
+from bibliopixel.util import log
+
+from . import audio, blend, control, lazy, prewarm, scheduler, telemetry
+
+
+class Sequence(sequence.Sequence):
+    """
+    Same parameters as :py:class:`bibliopixel.animation.sequence.Sequence`
+
+    :param telemetry: if set, a dict of parameters for
+        :py:class:`wonderdomicile.telemetry.Telemetry` to record timing with
+    :param crossfade: seconds at the end of each animation that the next one
+        fades in over, while both are running. 0 cuts straight to the next
+        one. Only animations that run for a `length` fade.
+    :param lazy: import and build each animation only when the sequence
+        first gets to it, see :py:mod:`wonderdomicile.lazy`
+    :param adaptive: step animations by the time that has passed and lower
+        their fps when they can't keep up, see
+        :py:mod:`wonderdomicile.scheduler`
+    :param audio: if set, a dict of parameters for
+        :py:class:`wonderdomicile.audio.Analyzer` to listen with while the
+        sequence runs
+    :param prewarm: build the next animation and get it ready to run on a
+        background thread while the current one runs, see
+        :py:mod:`wonderdomicile.prewarm`
+    :param control: if set, a dict of parameters for
+        :py:class:`wonderdomicile.control.Controller` to take changes to the
+        running sequence with. Its animations are wrapped as if `lazy` was
+        set, so they can be swapped for copies with new parameters.
+    """
+
+    @staticmethod
+    def pre_recursion(desc):
+        if desc.get('lazy') or desc.get('control') is not None:
+            desc['animations'] = [lazy.wrap(a) for a in desc['animations']]
+        return sequence.Sequence.pre_recursion(desc)
+
+    def __init__(self, *args, telemetry=None, crossfade=0, lazy=False,
+                 adaptive=False, audio=None, prewarm=False, control=None,
+                 **kwds):
+        super().__init__(*args, **kwds)
+        self.telemetry = telemetry
+        self.crossfade = crossfade
+        self.lazy = lazy
+        self.scheduler = scheduler.Scheduler() if adaptive else None
+        self.audio = audio
+        self.prewarm = prewarm
+        self._prewarmer = None
+        self.control = control
+        self._controller = None
+
+        # The animation to cut to, see select()
+        self._selected = None
+        self._frame_start = None
+
+        # The animation fading in, its frames and when it started
+        self._incoming = None
+
+        # What each of the two animations drew in the last frame of a fade,
+        # put back before each draws again
+        self._fade_colors = None
+        self._fading = ()
+
+    def pre_run(self):
+        if self.telemetry is not None:
+            telemetry.start(**self.telemetry)
+        if self.audio is not None:
+            audio.start(**self.audio)
+        if self.prewarm:
+            self._prewarmer = prewarm.Prewarmer()
+        if self.control is not None:
+            self._controller = control.Controller(self, **self.control)
+            self._controller.start()
+        super().pre_run()
+
+    def cleanup(self, clean_layout=True):
+        if self._incoming:
+            self._incoming[1].close()
+            self._end_fade()
+        super().cleanup(clean_layout)
+        if self.telemetry is not None:
+            telemetry.stop()
+        if self.audio is not None:
+            audio.stop()
+        if self._controller:
+            self._controller.stop()
+            self._controller = None
+
+    def _on_index(self, old_index):
+        super()._on_index(old_index)
+        animation = self.current_animation
+        if self._incoming and animation is self._incoming[0]:
+            # Carry on with the frames it's been fading in with, and give
+            # it its full length from now
+            self.frames = self._incoming[1]
+            animation.runner.run_start_time = animation.runner.time()
+            self._prewarm_next()
+        elif animation:
+            if self.scheduler:
+                self.scheduler.start(animation)
+            self.frames = self._first_frame(animation, self.frames)
+
+        recorder = telemetry.recorder
+        if recorder and animation:
+            if self.scheduler:
+                fps = self.scheduler.rate(animation).fps
+            else:
+                sleep_time = animation.runner and animation.runner.sleep_time
+                fps = sleep_time and 1 / sleep_time
+            recorder.set_label(animation.name or animation.title, fps)
+            self._frame_start = None
+
+    def step(self, amt=1):
+        if self._controller:
+            self._controller.apply()
+        selected = self._selected
+        if selected and (not self._prewarmer or self._prewarmer.ready(selected)):
+            self._cut()
+
+        recorder = telemetry.recorder
+        if not (recorder or self.scheduler):
+            return self._step_animations(amt)
+
+        start = time.time()
+        if recorder and self._frame_start is not None:
+            interval = start - self._frame_start
+            recorder.add('interval', interval)
+            animation = self.current_animation
+            # Late by more than bibliopixel allows before it logs an overrun
+            if animation and interval >= animation.sleep_time + 0.001:
+                recorder.count('missed')
+        self._frame_start = start
+
+        if self.scheduler:
+            self._schedule(start)
+        result = self._step_animations(amt)
+        elapsed = time.time() - start
+        if self.scheduler:
+            self._scheduled(elapsed)
+        if recorder:
+            recorder.add('step', elapsed)
+        return result
+
+    def _schedule(self, now):
+        animation = self.current_animation
+        if animation:
+            steps = self.scheduler.schedule(animation, now)
+            recorder = telemetry.recorder
+            if recorder and steps > 1:
+                recorder.count('skipped', steps - 1)
+        if self._incoming:
+            self.scheduler.schedule(self._incoming[0], now)
+
+    def _scheduled(self, elapsed):
+        animation = self.current_animation
+        if animation:
+            # The update after this step hasn't happened yet, the last one
+            # stands in for it
+            cost = elapsed + getattr(self.layout, 'update_time', 0)
+            fps = self.scheduler.finish(animation, cost)
+            recorder = telemetry.recorder
+            if recorder and fps:
+                recorder.set_target(fps)
+
+    def _step_animations(self, amt=1):
+        if self._incoming is None and self._fade_due():
+            self._start_fade()
+
+        if self._incoming is None:
+            return super().step(amt)
+
+        animation, frames, start = self._incoming
+        colors = self._fade_colors
+        color_list = self.layout.color_list
+
+        if colors:
+            blend.assign(color_list, colors[0])
+        super().step(amt)
+        if self.current_animation is animation or self.completed:
+            # The outgoing animation finished, so the one fading in gets the
+            # layout to itself
+            self._end_fade()
+            if not self.completed:
+                if colors:
+                    blend.assign(color_list, colors[1])
+                super().step(amt)
+            return
+
+        outgoing = blend.to_array(color_list)
+        if colors:
+            blend.assign(color_list, colors[1])
+        try:
+            next(frames)
+        except StopIteration:
+            self._end_fade()
+            blend.assign(color_list, outgoing)
+            return
+
+        incoming = blend.to_array(color_list)
+        self._fade_colors = outgoing, incoming
+        alpha = (self.time() - start) / self.crossfade
+        blend.assign(color_list, blend.blend(outgoing, incoming, 'alpha', alpha))
+
+    def _fade_due(self):
+        animation = self.current_animation
+        if not (self.crossfade and animation and animation.runner.seconds):
+            return False
+        if animation.state != runner.STATE.running:
+            return False
+        run = animation.runner
+        remaining = run.seconds - (run.time() - run.run_start_time)
+        return remaining <= self.crossfade
+
+    def _start_fade(self):
+        animation = self._upcoming()
+        if animation:
+            if self.scheduler:
+                self.scheduler.start(animation)
+            frames = self._first_frame(
+                animation, animation.generate_frames(False))
+            self._incoming = animation, frames, self.time()
+            self._fading = self.current_animation, animation
+            self._firmware_ok(False)
+
+    def _end_fade(self):
+        self._firmware_ok(True)
+        self._incoming = self._fade_colors = None
+        self._fading = ()
+
+    def _firmware_ok(self, ok):
+        # Blending needs both animations' frames here, not on the Teensys
+        for animation in self._fading:
+            if hasattr(animation, 'firmware_ok'):
+                animation.firmware_ok = ok
+
+    def _first_frame(self, animation, frames):
+        """
+        Wait for the animation if it's being prewarmed, and log how long
+        the first of its `frames` takes.
+        """
+        try:
+            warm = self._prewarmer and self._prewarmer.wait(animation)
+            start = time.time()
+            try:
+                next(frames)
+            except StopIteration:
+                return
+            elapsed = time.time() - start
+
+            log.info('%s: first frame in %.1fms%s', animation.name,
+                     1000 * elapsed, ' (prewarmed)' if warm else '')
+            recorder = telemetry.recorder
+            if recorder:
+                recorder.add('switch', elapsed)
+            self._prewarm_next()
+
+            yield
+            yield from frames
+        finally:
+            frames.close()
+
+    def _prewarm_next(self):
+        self._prewarm(self._upcoming())
+
+    def _prewarm(self, animation):
+        running = self.current_animation, self._incoming and self._incoming[0]
+        if self._prewarmer and animation not in running:
+            self._prewarmer.start(animation)
+
+    def find(self, name=None):
+        """
+        :return: the animation called `name`, or the current one if it's
+            None
+        :raises KeyError: if there's no such animation
+        """
+        if name is None:
+            return self.current_animation
+        for animation in self.animations:
+            if animation.name == name:
+                return animation
+        raise KeyError('No animation called %s' % name)
+
+    def select(self, name):
+        """
+        Cut to the animation called `name`, which runs for its full length
+        from then. With `prewarm`, it's got ready first and the cut happens
+        on the first frame after it is.
+        """
+        self._selected = self.find(name)
+        self._prewarm(self._selected)
+
+    def _cut(self):
+        animation, self._selected = self._selected, None
+        if self._incoming:
+            self._incoming[1].close()
+            self._end_fade()
+        self.index = list(self.animations).index(animation)
+
+    def _upcoming(self):
+        """
+        :return: the animation after the current one, or None if there
+            isn't a different one
+        """
+        # Setting the index wraps it around, so the sequence goes back to
+        # the first animation after the last
+        animation = self.animations[self.index + 1]
+        if animation is not self.current_animation:
+            return animation
@@ -0,0 +1,404 @@
+"""
+Serial driver for the Teensy controllers running controller/controller.ino.
+
+Each driver writes to its device on its own thread, so both Teensys are sent
+their halves of a frame at the same time. There are two frame buffers per
+device: one can be on the wire while the next frame is rendered into the
+other.
+
+Frames the device is already showing aren't sent at all, and with firmware
+that has PIXEL_DELTA only the changed pixels are sent when that is smaller
+than the whole frame. A frame only counts as shown once the device has acked
+it.
+
+Firmware from PIPELINE_VERSION acks each frame as soon as it has read it,
+with the frame's sequence number, and shows it afterwards. The driver then
+sends the next frame before waiting for the last one's ack, so one frame is
+in flight while the device shows the one before.
+
+Firmware from PROCEDURAL_VERSION can render some patterns itself. An
+animation that has a procedural.Program calls tick() on every driver instead
+of drawing the frame, and the driver sends the program once and then just
+the step number each frame.
+
+Brightness, gamma and channel order are applied on the host with one table
+lookup per frame, see output.py. With `device_brightness: true` the device
+scales the brightness instead.
+"""
+
+import queue, threading, time
+
+import numpy as np
+
+from bibliopixel.drivers.ledtype import LEDTYPE
+from bibliopixel.drivers.return_codes import RETURN_CODES, print_error
+from bibliopixel.drivers.serial.codes import CMDTYPE
+from bibliopixel.drivers.serial.driver import Serial
+from bibliopixel.util import log, util
+
+from . import codes, delta, output, procedural, telemetry
+
+# Number of frame buffers per device
+BUFFERS = 2
+
+SEQUENCED = {
+    CMDTYPE.PIXEL_DATA: codes.PIXEL_DATA_SEQ,
+    codes.PIXEL_DELTA: codes.PIXEL_DELTA_SEQ,
+}
+
+
+class Latency:
+    """
+    Running count, mean and maximum of a duration in seconds.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.last = 0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self):
+        return self.count and self.total / self.count
+
+    def __str__(self):
+        return '%d x %.2fms mean, %.2fms max' % (
+            self.count, 1000 * self.mean, 1000 * self.max)
+
+
+class Teensy(Serial):
+    """
+    Same parameters as :py:class:`bibliopixel.drivers.serial.Serial`, with
+    the Teensy's hardwareID and the WS2812B led type as defaults.
+
+    :param bool deltas: send only the changed pixels if the firmware can
+    :param bool pipeline: keep a frame in flight if the firmware can
+    :param bool device_brightness: have the device scale the brightness,
+        instead of the output table
+    """
+
+    def __init__(self, ledtype=LEDTYPE.WS2812B, hardwareID='16C0:0483',
+                 deltas=True, pipeline=True, device_brightness=False, **kwds):
+        super().__init__(ledtype=ledtype, hardwareID=hardwareID, **kwds)
+
+        # Brightness, gamma and channel order of every frame
+        self._output = output.Output(self.gamma, self.c_order)
+        if not device_brightness:
+            # Tells DriverBase to scale colors instead of calling it
+            self.set_device_brightness = None
+
+        self.firmware_version = self.device_version or self._get_version()
+        self.deltas = deltas and (
+            self.firmware_version >= codes.DELTA_VERSION)
+        self.pipeline = pipeline and (
+            self.firmware_version >= codes.PIPELINE_VERSION)
+
+        # True if animations can have the device render them with tick()
+        self.procedural = self.firmware_version >= codes.PROCEDURAL_VERSION
+
+        # Sequence number of the frame in flight, None if there isn't one,
+        # and its bytes if it's a frame of colors rather than a tick
+        self._pending = None
+        self._pending_frame = None
+        self._sequence = 0
+
+        count = self.bufByteCount() + self._bufPad
+        self._free = queue.Queue()
+        for i in range(BUFFERS):
+            self._free.put(bytearray(count))
+        self._ready = queue.Queue()
+
+        # The last frame the device acked. It shows that, or the frame in
+        # flight after it. If anything went wrong since, we don't know what
+        # the device is showing and the next frame is sent whole.
+        self._shown = bytearray(count)
+        self._in_sync = False
+
+        # The tick for the next frame, and the last program sent and
+        # whether the device has it
+        self._tick = None
+        self._program = None
+        self._program_ok = False
+        self._program_table = None
+
+        self.full_frames = 0
+        self.delta_frames = 0
+        self.skipped_frames = 0
+        self.tick_frames = 0
+        self.bytes_sent = 0
+
+        # Time spent writing a frame and waiting for the ack
+        self.send_latency = Latency()
+
+        # Time the render thread waited for a free buffer
+        self.wait_latency = Latency()
+
+        self.errors = 0
+        self._writer = None
+
+    def start(self):
+        self._writer = threading.Thread(
+            target=self._write_frames, name='Teensy %s' % self.dev,
+            daemon=True)
+        self._writer.start()
+
+    def stop(self):
+        if self._writer:
+            self._ready.put(None)
+
+    def join(self, timeout=None):
+        if self._writer:
+            self._writer.join(timeout)
+            self._writer = None
+
+    def cleanup(self):
+        self.stop()
+        self.join()
+        log.info('%s: send %s, wait %s, %d errors', self.dev,
+                 self.send_latency, self.wait_latency, self.errors)
+        log.info('%s: %d full, %d delta, %d skipped, %d tick frames, %d bytes',
+                 self.dev, self.full_frames, self.delta_frames,
+                 self.skipped_frames, self.tick_frames, self.bytes_sent)
+        super().cleanup()
+
+    def _get_version(self):
+        self._write(util.generate_header(CMDTYPE.GETVER, 0))
+        if self._read() == RETURN_CODES.SUCCESS:
+            return self._read() or 0
+        return 0
+
+    def tick(self, program, step, colors=None, steps=1):
+        """
+        Have the device render the next frame itself instead of sending it
+        the colors. Called on the render thread before update_colors().
+
+        :param program: the animation's procedural.Program
+        :param int step: the step to render
+        :param colors: if set, the program is sent again with the device
+            starting from these colors of the whole layout
+        :param int steps: steps since the last frame, more than one when
+            the sequence skips some
+        """
+        self._tick = program, step, colors, steps
+
+    def update_colors(self):
+        """
+        Render the current colors into a free frame buffer and hand it to
+        the writer thread. Called on the render thread.
+        """
+        tick, self._tick = self._tick, None
+        if not self._writer:
+            return super().update_colors()
+
+        start = time.time()
+        frame = self._free.get()
+        waited = time.time() - start
+        self.wait_latency.add(waited)
+
+        with self.brightness_lock:
+            brightness, self._waiting_brightness = (
+                self._waiting_brightness, None)
+        if brightness is not None and not self.set_device_brightness:
+            # Goes in the output table, which programs use too
+            self._brightness, brightness = brightness, None
+            self._update_output()
+
+        if not tick:
+            self._render_to(frame)
+        self._ready.put((frame, brightness, tick))
+
+        recorder = telemetry.recorder
+        if recorder:
+            recorder.add('wait', waited)
+            recorder.add('update', time.time() - start)
+
+    def _render(self):
+        self._render_to(self._buf)
+
+    def _render_to(self, buf):
+        """
+        Write the device's bytes for the current colors into buf.
+        """
+        self._update_output()
+        end = self._pos + self.numLEDs
+        self._output.render(self._colors[self._pos:end], buf)
+
+    def _update_output(self):
+        self._output.set_brightness(
+            255 if self.set_device_brightness else self._brightness)
+
+    def _send_frame(self, frame):
+        """
+        Send a frame as a delta or whole, or not at all if the device is
+        already showing it.
+        """
+        acked = True
+        latest = self._shown
+        if self._pending_frame is not None:
+            latest = self._pending_frame
+        if self._in_sync and frame == latest:
+            # Skipped only if the device really got it
+            acked = self._receive_ack()
+            if self._in_sync and frame == self._shown:
+                self.skipped_frames += 1
+                return True
+
+        cmd, payload = CMDTYPE.PIXEL_DATA, frame
+        if self._in_sync and self.deltas:
+            # Whether or not the frame in flight makes it, the device ends
+            # up with this one
+            shown = [_colors(self._shown)]
+            if self._pending_frame is not None:
+                shown.append(_colors(self._pending_frame))
+            changes = delta.smaller(_colors(frame), *shown)
+            if changes is not None:
+                cmd, payload = codes.PIXEL_DELTA, changes
+
+        if cmd == CMDTYPE.PIXEL_DATA:
+            self.full_frames += 1
+        else:
+            self.delta_frames += 1
+
+        if self.pipeline:
+            ok = self._send_sequenced(SEQUENCED[cmd], payload, bytes(frame))
+        else:
+            self._packet = util.generate_header(cmd, len(payload)) + payload
+            ok = self._send_packet()
+            self._in_sync = bool(ok)
+            if self._in_sync:
+                self._shown[:] = frame
+
+        self.bytes_sent += len(self._packet)
+        return bool(acked and ok)
+
+    def _send_tick(self, program, step, colors, steps):
+        """
+        Send the program if the device doesn't have it, then the step.
+        """
+        table = self._output.table
+        if colors is not None:
+            self._program = program.encode(
+                colors, self._pos, self.numLEDs, table, self.c_order)
+            self._program_ok = False
+        elif table is not self._program_table:
+            # The brightness changed. The device starts over from the
+            # program's colors, which the next few steps paint over.
+            self._program = procedural.set_table(self._program, table)
+            self._program_ok = False
+        self._program_table = table
+
+        if not self._program_ok:
+            # Its reply would get mixed up with a frame's ack
+            self._receive_ack()
+            self._packet = util.generate_header(
+                codes.PROGRAM, len(self._program)) + self._program
+            self.bytes_sent += len(self._packet)
+            self._program_ok = bool(self._send_packet())
+            if not self._program_ok:
+                return False
+
+        self.tick_frames += 1
+        payload = procedural.TICK.pack(step % 2 ** 32, min(steps, 255))
+        ok = self._send_sequenced(codes.TICK, payload)
+        if not self.pipeline:
+            ok = ok and self._receive_ack()
+        self.bytes_sent += len(self._packet)
+        self._program_ok = bool(ok)
+        return ok
+
+    def _send_sequenced(self, cmd, payload, frame=None):
+        """
+        Send a frame, then wait for the ack of the one before it.
+
+        :param frame: the bytes the device shows once it has the frame, None
+            for a tick
+        """
+        self._sequence = (self._sequence + 1) % 256
+        self._packet = util.generate_header(cmd, len(payload) + 1)
+        self._packet.append(self._sequence)
+        self._packet += payload
+        self._write(self._packet)
+
+        ok = self._receive_ack()
+        self._pending = self._sequence
+        self._pending_frame = frame
+        if frame is None:
+            # Whatever the device shows after a tick, it isn't self._shown
+            self._in_sync = False
+        return ok
+
+    def _receive_ack(self):
+        """
+        Wait for the ack of the frame in flight, if there is one. If it's a
+        frame of colors, that's what the device shows now.
+        """
+        if self._pending is None:
+            return True
+
+        sequence, self._pending = self._pending, None
+        frame, self._pending_frame = self._pending_frame, None
+        start = time.time()
+        code = self._read()
+        received = self._read()
+
+        recorder = telemetry.recorder
+        if recorder:
+            recorder.add('ack', time.time() - start)
+        if code is None or received is None:
+            self.devices.error(fail=False)
+        elif code != RETURN_CODES.SUCCESS:
+            print_error(code)
+        elif received != sequence:
+            log.error('%s: ack for frame %d, expected %d',
+                      self.dev, received, sequence)
+            self._flushInput()
+        else:
+            if frame is not None:
+                self._shown[:] = frame
+                self._in_sync = True
+            return True
+        self._in_sync = False
+
+    def _write_frames(self):
+        while True:
+            item = self._ready.get()
+            if item is None:
+                self._receive_ack()
+                break
+
+            frame, brightness, tick = item
+            if brightness is not None:
+                # Its reply would get mixed up with the frame's ack
+                if not self._receive_ack():
+                    self.errors += 1
+                self._brightness = brightness
+                self.set_device_brightness(brightness)
+
+            start = time.time()
+            if tick:
+                ok = self._send_tick(*tick)
+            else:
+                ok = self._send_frame(frame)
+            sent = time.time() - start
+            self.send_latency.add(sent)
+            self._free.put(frame)
+
+            if not ok:
+                self.errors += 1
+
+            recorder = telemetry.recorder
+            if recorder:
+                recorder.add('send', sent)
+                if not ok:
+                    recorder.count('errors')
+
+
+def _colors(frame):
+    return np.frombuffer(frame, np.uint8, len(frame) // 3 * 3).reshape(-1, 3)
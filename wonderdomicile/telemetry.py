@@ -0,0 +1,224 @@
+"""
+Frame timing for each animation, kept as histograms over the last minute or
+so and written out to a JSON file every few seconds.
+
+Recording is off unless something calls start(), usually
+wonderdomicile.sequence.Sequence from its `telemetry` parameter. Code that
+records checks the module's `recorder` first, so it costs one attribute
+lookup when it is off:
+
+    recorder = telemetry.recorder
+    if recorder:
+        recorder.add('send', seconds)
+
+To see the last dump on the box:
+
+    python -m wonderdomicile.telemetry /var/tmp/wonderdomicile-telemetry.json
+"""
+
+import bisect, json, os, sys, threading, time
+
+from bibliopixel.util import log
+
+# Upper edges of the histogram bins in seconds, from 0.1ms to 10s. Times
+# past the last one go in an extra bin.
+EDGES = [1e-4 * 10 ** (i / 10) for i in range(51)]
+
+PERCENTILES = 50, 90, 99
+
+# The Telemetry being recorded to, None when it is off
+recorder = None
+
+
+class Histogram:
+    """
+    Counts of durations over the last `window` seconds, in `slots` slices
+    that are reused as time moves on.
+    """
+
+    def __init__(self, window=60, slots=6):
+        self.slot_seconds = window / slots
+        self.counts = [[0] * (len(EDGES) + 1) for i in range(slots)]
+        self.totals = [0.0] * slots
+        self.maxes = [0.0] * slots
+        self._slot = None
+
+    def add(self, seconds, now):
+        self._rotate(now)
+        slot = self._slot % len(self.counts)
+        self.counts[slot][bisect.bisect_left(EDGES, seconds)] += 1
+        self.totals[slot] += seconds
+        if seconds > self.maxes[slot]:
+            self.maxes[slot] = seconds
+
+    def _rotate(self, now):
+        slot = int(now // self.slot_seconds)
+        if self._slot is not None and slot != self._slot:
+            for s in range(self._slot + 1, slot + 1)[-len(self.counts):]:
+                s %= len(self.counts)
+                self.counts[s] = [0] * len(self.counts[s])
+                self.totals[s] = 0.0
+                self.maxes[s] = 0.0
+        self._slot = slot
+
+    def summary(self, now):
+        """
+        :return: dict of the count, mean, max and percentiles in the window,
+            with times in milliseconds
+        """
+        self._rotate(now)
+        counts = [sum(c) for c in zip(*self.counts)]
+        count = sum(counts)
+        result = {'count': count}
+        if not count:
+            return result
+
+        result['mean'] = 1000 * sum(self.totals) / count
+        result['max'] = 1000 * max(self.maxes)
+        for p in PERCENTILES:
+            target, seen = count * p / 100, 0
+            for i, c in enumerate(counts):
+                seen += c
+                if seen >= target:
+                    break
+            edge = EDGES[i] if i < len(EDGES) else max(self.maxes)
+            result['p%d' % p] = 1000 * min(edge, max(self.maxes))
+        return result
+
+
+class Telemetry:
+    """
+    Histograms of named durations and counts of named events, for each
+    animation in turn.
+
+    :param path: file to write the summary to, or None
+    :param interval: seconds between writes
+    :param window: seconds the histograms cover
+    """
+
+    def __init__(self, path=None, interval=10, window=60):
+        self.path = path
+        self.interval = interval
+        self.window = window
+
+        # The animation that durations and events are recorded against
+        self.label = None
+        self.targets = {}
+
+        self.histograms = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def set_label(self, label, target_fps=None):
+        self.label = label
+        self.targets[label] = target_fps
+
+    def set_target(self, target_fps):
+        """
+        Change the target fps of the current label, when it is lowered or
+        raised while running.
+        """
+        self.targets[self.label] = target_fps
+
+    def add(self, name, seconds):
+        now = time.time()
+        with self.lock:
+            key = self.label, name
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.window)
+            histogram.add(seconds, now)
+
+    def count(self, name, n=1):
+        with self.lock:
+            key = self.label, name
+            self.counts[key] = self.counts.get(key, 0) + n
+
+    def summary(self):
+        now = time.time()
+        result = {}
+        with self.lock:
+            for (label, name), histogram in self.histograms.items():
+                entry = result.setdefault(str(label), {})
+                entry[name] = histogram.summary(now)
+            for (label, name), count in self.counts.items():
+                result.setdefault(str(label), {})[name] = count
+
+        for label, target in self.targets.items():
+            entry = result.setdefault(str(label), {})
+            entry['target_fps'] = target
+            interval = entry.get('interval', {}).get('mean')
+            if interval:
+                entry['fps'] = 1000 / interval
+        return result
+
+    def dump(self, path=None):
+        path = path or self.path
+        temp = path + '.tmp'
+        with open(temp, 'w') as fp:
+            json.dump({'time': time.time(), 'window': self.window,
+                       'animations': self.summary()}, fp, indent=2)
+        os.replace(temp, path)
+
+    def start(self):
+        if self.path and not self._thread:
+            self._thread = threading.Thread(
+                target=self._dump_every_interval, name='Telemetry',
+                daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _dump_every_interval(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.dump()
+            except Exception:
+                log.exception('Unable to write telemetry to %s', self.path)
+
+
+def start(**kwds):
+    """
+    Start recording to a new Telemetry made from kwds.
+    """
+    global recorder
+    stop()
+    recorder = Telemetry(**kwds)
+    recorder.start()
+    return recorder
+
+
+def stop():
+    global recorder
+    if recorder:
+        recorder.stop()
+        if recorder.path:
+            recorder.dump()
+    recorder = None
+
+
+def print_summary(data, file=sys.stdout):
+    columns = 'count', 'mean', 'p50', 'p99', 'max'
+    for label, entry in sorted(data['animations'].items()):
+        target, fps = entry.get('target_fps'), entry.get('fps')
+        print('%s: %s fps, target %s, %d missed, %d skipped' % (
+            label, fps and '%.1f' % fps, target and '%.1f' % target,
+            entry.get('missed', 0), entry.get('skipped', 0)), file=file)
+        for name, values in sorted(entry.items()):
+            if isinstance(values, dict):
+                print('  %-8s' % name + ''.join(
+                    ' %s %.2f' % (c, values[c]) if c != 'count' else
+                    ' %s %d' % (c, values[c])
+                    for c in columns if c in values), file=file)
+
+
+if __name__ == '__main__':
+    with open(sys.argv[1]) as fp:
+        print_summary(json.load(fp))